@@ -1,9 +1,7 @@
 import json
 from pathlib import Path
 import streamlit as st
-import numpy as np
 from PIL import Image
-import tensorflow as tf
 
 # ----------------------------------
 # PAGE CONFIG
@@ -22,7 +20,6 @@ st.divider()
 # ----------------------------------
 PROJECT_ROOT = Path.cwd()
 REGISTRY_PATH = Path("registry/model_registry.json")
-MODELS_DIR = Path("models")
 
 # ----------------------------------
 # VERIFY PROJECT ROOT
@@ -48,68 +45,46 @@ if not production_exp:
     st.warning("⚠️ No production model set yet")
     st.stop()
 
-model_path = MODELS_DIR / f"model_{production_exp}.keras"
+# ----------------------------------
+# LOAD MODEL (shared, hot-reloaded on registry change)
+# ----------------------------------
+from src.predictor import get_predictor
+
+predictor = get_predictor()
 
 # ----------------------------------
 # FAILSAFE MODEL CHECK
 # ----------------------------------
-if not model_path.exists():
+try:
+    model_path = predictor.model_path
+except FileNotFoundError as e:
     st.error("❌ Production model not found")
-    st.code(str(model_path))
+    st.code(str(e))
     st.stop()
 
-# ----------------------------------
-# LOAD MODEL
-# ----------------------------------
-@st.cache_resource
-def load_model_safe(path):
-    return tf.keras.models.load_model(path)
-
-model = load_model_safe(model_path)
-
 # IMPORTANT: correct class order (same as training)
 from src.utils import CLASS_NAMES
 
-IMG_SIZE = (224, 224)
-
 # ----------------------------------
 # PREPROCESS (MATCH TRAINING EXACTLY)
 # ----------------------------------
-def preprocess(img):
-    img = img.convert("RGB").resize(IMG_SIZE)
-    arr = np.array(img, dtype=np.float32)
-    arr = tf.keras.applications.mobilenet_v2.preprocess_input(arr)
-    return np.expand_dims(arr, axis=0)
+# preprocess_input is part of the model graph, so the model
+# receives raw 0-255 pixels exactly as during training.
 
 # ----------------------------------
-# PREDICT
+# PREDICT (cached by image content + model)
 # ----------------------------------
-def predict(img):
-    preds = model.predict(preprocess(img), verbose=0)[0]
-    idx = int(np.argmax(preds))
-    label = CLASS_NAMES[idx]
-    confidence = float(preds[idx])
-    return label, confidence, preds
+from src.prediction_cache import get_prediction_cache, predict_bytes
+
+def predict(data: bytes):
+    probs = predict_bytes(predictor, [data], get_prediction_cache())[0]
+    idx = int(probs.argmax())
+    return CLASS_NAMES[idx], float(probs[idx]), probs
 
 # ----------------------------------
-# SHELF LIFE LOGIC
+# SHELF LIFE LOGIC (shared with reports and the estimator page)
 # ----------------------------------
-def shelf_life(label):
-    mapping = {
-        "unripe": 5,
-        "ripe": 2,
-        "overripe": 1,
-        "rotten": 0
-    }
-    return mapping.get(label, 0)
-
-def recommendation(label):
-    return {
-        "unripe": "Keep at room temperature. Not ready yet.",
-        "ripe": "Perfect to eat now. Consume soon.",
-        "overripe": "Use immediately for smoothies or baking.",
-        "rotten": "Not safe for consumption.",
-    }[label]
+from src.shelf_life import ADVICE, estimate_shelf_life_batch
 
 # ----------------------------------
 # UI INPUT
@@ -123,10 +98,10 @@ with col2:
     captured = st.camera_input("Take photo")
 
 img = None
-if uploaded:
-    img = Image.open(uploaded)
-elif captured:
-    img = Image.open(captured)
+source = uploaded or captured
+if source:
+    data = source.getvalue()
+    img = Image.open(source)
 
 # ----------------------------------
 # INFERENCE DISPLAY
@@ -140,7 +115,7 @@ if img:
     with c1:
         st.image(img, caption="Input Image", use_container_width=True)
 
-    label, conf, raw = predict(img)
+    label, conf, raw = predict(data)
 
     with c2:
         st.markdown(f"## 🏷️ {label.upper()}")
@@ -155,12 +130,12 @@ if img:
             st.progress(float(raw[i]))
 
         st.divider()
-        days = shelf_life(label)
-        st.metric("Estimated shelf life", f"{days} days")
-        st.info(recommendation(label))
+        days, codes = estimate_shelf_life_batch(raw[None, :])
+        st.metric("Estimated shelf life", f"{days[0]:.2f} days")
+        st.info(ADVICE[codes[0]])
 
 # ----------------------------------
 # FOOTER
 # ----------------------------------
 st.divider()
-st.caption(f"🚀 Using production model: `{model_path.name}`")
\ No newline at end of file
+st.caption(f"🚀 Using production model: `{predictor.exp_id}` ({model_path.name})")
\ No newline at end of file
@@ -1,5 +1,8 @@
 import streamlit as st
 
+from src.shelf_life import estimate_shelf_life
+from src.utils import CLASS_NAMES
+
 st.set_page_config(
     page_title="Shelf Life Estimator | CVLab",
     layout="wide"
@@ -33,7 +36,7 @@ st.subheader("Prediction Inputs")
 
 ripeness = st.selectbox(
     "Predicted Ripeness Stage",
-    ["unripe", "ripe", "overripe", "rotten"]
+    CLASS_NAMES
 )
 
 confidence = st.slider(
@@ -45,16 +48,9 @@ confidence = st.slider(
 )
 
 # --------------------------------------------------
-# Shelf-life logic
+# Shelf-life logic (same table as inference and reports)
 # --------------------------------------------------
-BASE_DAYS = {
-    "unripe": 5.0,
-    "ripe": 2.0,
-    "overripe": 0.7,
-    "rotten": 0.0
-}
-
-estimated_days = round(BASE_DAYS[ripeness] * confidence, 2)
+estimated_days, advice = estimate_shelf_life(ripeness, confidence)
 
 # --------------------------------------------------
 # Output
@@ -72,13 +68,13 @@ c2.metric("Confidence Used", f"{confidence*100:.1f}%")
 st.subheader("Usage Recommendation")
 
 if ripeness == "unripe":
-    st.success("Store at room temperature. Suitable for later consumption.")
+    st.success(advice)
 elif ripeness == "ripe":
-    st.info("Consume soon or refrigerate to slow ripening.")
+    st.info(advice)
 elif ripeness == "overripe":
-    st.warning("Use immediately for smoothies, baking, or cooking.")
+    st.warning(advice)
 else:
-    st.error("Not recommended for consumption.")
+    st.error(advice)
 
 # --------------------------------------------------
 # Disclaimer
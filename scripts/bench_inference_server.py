@@ -0,0 +1,101 @@
+import argparse
+import io
+import json
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from src.backends import BACKENDS
+from src.inference_server import DEFAULT_HOST, InferenceServer
+
+
+def synthetic_jpegs(count, size=(640, 480), seed=0):
+    """
+    Noisy solid-colour JPEGs, encoded in memory.
+    """
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(count):
+        base = rng.integers(0, 256, size=3)
+        noise = rng.integers(-40, 40, size=(size[1], size[0], 3))
+        arr = np.clip(base + noise, 0, 255).astype(np.uint8)
+        buf = io.BytesIO()
+        Image.fromarray(arr).save(buf, format="JPEG", quality=85)
+        images.append(buf.getvalue())
+    return images
+
+
+def _post(url, body):
+    req = urllib.request.Request(
+        url, data=body, headers={"Content-Type": "image/jpeg"}, method="POST"
+    )
+    start = time.perf_counter()
+    with urllib.request.urlopen(req) as resp:
+        payload = json.loads(resp.read())
+    return time.perf_counter() - start, payload
+
+
+def run_client(base_url, requests=200, concurrency=8):
+    images = synthetic_jpegs(min(requests, 32))
+    url = f"{base_url}/predict"
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(
+            lambda i: _post(url, images[i % len(images)]), range(requests)
+        ))
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array([r[0] for r in results]) * 1000.0
+    with urllib.request.urlopen(f"{base_url}/stats") as resp:
+        server_stats = json.loads(resp.read())
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "requests_per_sec": round(requests / elapsed, 2),
+        "latency_p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "latency_p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "server": server_stats,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="Existing server, e.g. http://127.0.0.1:8008")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--backend", default="keras", choices=BACKENDS)
+    parser.add_argument("--cache", action="store_true",
+                        help="Enable the local server's prediction cache. Off by default: "
+                             "the client repeats 32 images, so most requests would be hits")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        # Start a local server on a free port for a self-contained run
+        server = InferenceServer(
+            host=DEFAULT_HOST,
+            port=0,
+            max_batch_size=args.max_batch_size,
+            max_wait_ms=args.max_wait_ms,
+            backend=args.backend,
+            use_cache=args.cache,
+        )
+        print(f"Production model: {server.predictor.exp_id} ({args.backend})")
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://{DEFAULT_HOST}:{server.server_address[1]}"
+
+    try:
+        print(json.dumps(run_client(base_url, args.requests, args.concurrency), indent=2))
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
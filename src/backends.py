@@ -0,0 +1,262 @@
+import threading
+
+import numpy as np
+
+BACKENDS = ("keras", "tflite", "tflite_int8", "onnx", "serving")
+
+
+# ===============================
+# KERAS
+# ===============================
+
+def compile_inference_fn(model, jit_compile=False, warmup=True):
+    """
+    Wrap `model` in a tf.function with a fixed (None, H, W, 3) float32
+    signature, optionally XLA-compiled, and trace it once up front.
+
+    Calling this skips model.predict's per-call dataset, callback and
+    step-function setup, which dominates batch-of-one latency.
+    """
+    import tensorflow as tf
+
+    from src.utils import IMG_SIZE
+
+    spec = tf.TensorSpec((None, IMG_SIZE[1], IMG_SIZE[0], 3), tf.float32)
+
+    @tf.function(input_signature=[spec], jit_compile=jit_compile)
+    def infer(x):
+        return model(x, training=False)
+
+    if warmup:
+        infer(np.zeros((1, IMG_SIZE[1], IMG_SIZE[0], 3), dtype=np.float32))
+    return infer
+
+
+def set_tf_threads(intra_op_threads=None, inter_op_threads=None):
+    """
+    Cap TensorFlow's thread pools. TensorFlow fixes them when its
+    runtime first starts, so asking for different counts afterwards
+    raises ValueError rather than being silently ignored.
+    """
+    import tensorflow as tf
+
+    try:
+        if intra_op_threads:
+            tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+        if inter_op_threads:
+            tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+    except RuntimeError as e:
+        raise ValueError(
+            f"Cannot set TensorFlow threads (intra={intra_op_threads}, "
+            f"inter={inter_op_threads}) after it has started: {e}"
+        ) from e
+
+
+class KerasBackend:
+    """
+    Keras model run through a compiled fixed-signature function
+    (`compiled=False` falls back to predict_on_batch). `path` may be a
+    .keras file, a fast artifact or a head-only artifact
+    (see src/fast_model.py). Thread counts are applied to TensorFlow
+    before the model is loaded.
+    """
+
+    name = "keras"
+
+    def __init__(
+        self,
+        path,
+        compiled=True,
+        jit_compile=False,
+        num_threads=None,
+        inter_op_threads=None,
+    ):
+        set_tf_threads(num_threads, inter_op_threads)
+
+        from src.fast_model import head_inference_fn, load_model_artifact
+        from src.model_parts import is_head_artifact
+
+        self.path = path
+        self.model = load_model_artifact(path)
+        self._infer = self._head_infer = None
+        if compiled and is_head_artifact(path):
+            # Heads on one trunk share its traced function (fast swaps)
+            self._head_infer = head_inference_fn(path, jit_compile=jit_compile)
+        elif compiled:
+            self._infer = compile_inference_fn(self.model, jit_compile=jit_compile)
+
+    def predict(self, x: np.ndarray):
+        x = np.asarray(x, dtype=np.float32)
+        if self._head_infer is not None:
+            return self._head_infer(x)
+        if self._infer is not None:
+            return self._infer(x).numpy()
+        return np.asarray(self.model.predict_on_batch(x))
+
+
+# ===============================
+# TFLITE
+# ===============================
+
+def _tflite_interpreter_class():
+    """
+    Prefer the standalone LiteRT / tflite-runtime packages so edge boxes
+    do not need full TensorFlow installed.
+    """
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    try:
+        from tflite_runtime.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    import tensorflow as tf
+    return tf.lite.Interpreter
+
+
+class TFLiteBackend:
+    """
+    Runs a .tflite export through the TFLite interpreter. The default CPU
+    op resolver applies the XNNPACK delegate to float models.
+
+    The interpreter is not thread-safe, so calls are serialised.
+    """
+
+    name = "tflite"
+
+    def __init__(self, path, num_threads=None):
+        Interpreter = _tflite_interpreter_class()
+
+        self.path = path
+        self.interpreter = Interpreter(model_path=str(path), num_threads=num_threads)
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = None
+        self._lock = threading.Lock()
+
+    def _ensure_batch_size(self, n):
+        if n == self._batch_size:
+            return
+        shape = list(self._input["shape"])
+        shape[0] = n
+        self.interpreter.resize_tensor_input(self._input["index"], shape)
+        self.interpreter.allocate_tensors()
+        self._batch_size = n
+
+    def predict(self, x: np.ndarray):
+        x = np.ascontiguousarray(x, dtype=self._input["dtype"])
+        with self._lock:
+            self._ensure_batch_size(len(x))
+            self.interpreter.set_tensor(self._input["index"], x)
+            self.interpreter.invoke()
+            return self.interpreter.get_tensor(self._output["index"]).copy()
+
+
+# ===============================
+# ONNX RUNTIME
+# ===============================
+
+class OnnxBackend:
+    """
+    Runs an .onnx export on the ONNX Runtime CPU provider.
+
+    The input is bound straight from the caller's array and results are
+    written into an output buffer preallocated per batch size, so a
+    request allocates nothing inside the session.
+    """
+
+    name = "onnx"
+
+    def __init__(self, path, intra_op_threads=None, inter_op_threads=None):
+        import onnxruntime as ort
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        if intra_op_threads:
+            opts.intra_op_num_threads = intra_op_threads
+        if inter_op_threads:
+            opts.inter_op_num_threads = inter_op_threads
+
+        self.path = path
+        self.session = ort.InferenceSession(
+            str(path), sess_options=opts, providers=["CPUExecutionProvider"]
+        )
+        self._input_name = self.session.get_inputs()[0].name
+        output = self.session.get_outputs()[0]
+        self._output_name = output.name
+        self._num_classes = output.shape[-1]
+        self._binding = self.session.io_binding()
+        self._buffers = {}
+        self._lock = threading.Lock()
+
+    def predict(self, x: np.ndarray):
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        n = len(x)
+        with self._lock:
+            out = self._buffers.get(n)
+            if out is None:
+                out = self._buffers[n] = np.empty((n, self._num_classes), np.float32)
+
+            self._binding.bind_cpu_input(self._input_name, x)
+            self._binding.bind_output(
+                self._output_name, "cpu", 0, np.float32, out.shape, out.ctypes.data
+            )
+            self.session.run_with_iobinding(self._binding)
+            return out.copy()
+
+
+# ===============================
+# SERVING SAVEDMODEL
+# ===============================
+
+class ServingBackend:
+    """
+    Runs the exported serving SavedModel, whose signatures take uint8
+    pixels or encoded image bytes and do decode, resize and
+    normalisation inside one graph.
+    """
+
+    name = "serving"
+
+    def __init__(self, path):
+        import tensorflow as tf
+
+        self._tf = tf
+        self.path = path
+        self.module = tf.saved_model.load(str(path))
+        self._serve_uint8 = self.module.signatures["serve_uint8"]
+        self._serve_encoded = self.module.signatures["serve_encoded"]
+
+    def predict(self, x: np.ndarray):
+        x = self._tf.constant(np.asarray(x, dtype=np.uint8))
+        return self._serve_uint8(image=x)["probabilities"].numpy()
+
+    def predict_encoded(self, blobs):
+        blobs = self._tf.constant([bytes(b) for b in blobs])
+        return self._serve_encoded(image_bytes=blobs)["probabilities"].numpy()
+
+
+def load_backend(name, path, **options):
+    if name == "keras":
+        return KerasBackend(
+            path,
+            compiled=options.get("compiled", True),
+            jit_compile=options.get("jit_compile", False),
+            num_threads=options.get("num_threads"),
+            inter_op_threads=options.get("inter_op_threads"),
+        )
+    if name in ("tflite", "tflite_int8"):
+        return TFLiteBackend(path, num_threads=options.get("num_threads"))
+    if name == "onnx":
+        return OnnxBackend(
+            path,
+            intra_op_threads=options.get("num_threads"),
+            inter_op_threads=options.get("inter_op_threads"),
+        )
+    if name == "serving":
+        return ServingBackend(path)
+    raise ValueError(f"Unknown backend '{name}'. Choose from {BACKENDS}")
@@ -0,0 +1,201 @@
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from src.backends import BACKENDS
+from src.predictor import OUTPUTS_DIR, Predictor
+from src.preprocessing import stack_images
+from src.utils import IMG_SIZE
+
+
+def peak_rss_mb():
+    """
+    Peak resident memory of this process in MB, where the OS exposes it.
+    """
+    try:
+        import resource
+        # ru_maxrss is KB on Linux, bytes on macOS
+        scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+    except ImportError:
+        return None
+
+
+def synthetic_batch(batch_size, seed=0):
+    rng = np.random.default_rng(seed)
+    images = rng.integers(0, 256, size=(batch_size, IMG_SIZE[1], IMG_SIZE[0], 3))
+    return stack_images(images.astype(np.uint8))
+
+
+def summarize_latencies(latencies_s, batch_size):
+    ms = np.asarray(latencies_s) * 1000.0
+    return {
+        "latency_p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "latency_p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "images_per_sec": round(batch_size * len(ms) / (ms.sum() / 1000.0), 2),
+    }
+
+
+def time_calls(fn, x, runs, warmup):
+    for _ in range(warmup):
+        fn(x)
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn(x)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+# ===============================
+# SINGLE BACKEND (IN-PROCESS)
+# ===============================
+
+def benchmark_backend(backend="keras", batch_size=1, runs=50, warmup=5):
+    predictor = Predictor(backend=backend)
+
+    start = time.perf_counter()
+    predictor.refresh(force=True)
+    load_s = time.perf_counter() - start
+
+    x = synthetic_batch(batch_size)
+    latencies = time_calls(predictor.predict_array, x, runs, warmup)
+    rss = peak_rss_mb()
+
+    return {
+        "backend": backend,
+        "exp_id": predictor.exp_id,
+        "artifact": str(predictor.model_path),
+        "batch_size": batch_size,
+        "load_seconds": round(load_s, 3),
+        **summarize_latencies(latencies, batch_size),
+        "peak_rss_mb": round(rss, 1) if rss is not None else None,
+    }
+
+
+# ===============================
+# KERAS CALL PATHS (SIDE BY SIDE)
+# ===============================
+
+def benchmark_keras_paths(batch_size=1, runs=50, warmup=5):
+    """
+    Latency of the same production Keras model through model.predict,
+    predict_on_batch, the compiled tf.function and its XLA variant.
+    """
+    from src.backends import compile_inference_fn
+
+    predictor = Predictor(backend="keras", compiled=False)
+    model = predictor.model
+    x = synthetic_batch(batch_size).astype(np.float32)
+
+    paths = {
+        "model.predict": lambda b: model.predict(b, verbose=0),
+        "predict_on_batch": model.predict_on_batch,
+        "tf.function": compile_inference_fn(model),
+    }
+    try:
+        paths["tf.function+xla"] = compile_inference_fn(model, jit_compile=True)
+    except Exception as e:
+        print(f"XLA unavailable: {e}")
+
+    results = []
+    for name, fn in paths.items():
+        latencies = time_calls(fn, x, runs, warmup)
+        results.append({
+            "path": name,
+            "exp_id": predictor.exp_id,
+            "batch_size": batch_size,
+            **summarize_latencies(latencies, batch_size),
+        })
+    return results
+
+
+# ===============================
+# COMPARISON (ONE PROCESS PER BACKEND)
+# ===============================
+
+def compare_backends(backends=BACKENDS, batch_size=1, runs=50, warmup=5):
+    """
+    Benchmark each backend in a fresh interpreter so load time and
+    peak RSS are not polluted by the other backends.
+    """
+    results = []
+    for backend in backends:
+        cmd = [
+            sys.executable, "-m", "src.benchmark",
+            "--backend", backend,
+            "--batch-size", str(batch_size),
+            "--runs", str(runs),
+            "--warmup", str(warmup),
+            "--json",
+        ]
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        if proc.returncode != 0:
+            err = proc.stderr.strip().splitlines()
+            results.append({"backend": backend, "error": err[-1] if err else "failed"})
+            continue
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    return results
+
+
+def save_report(results):
+    exp_ids = {r["exp_id"] for r in results if "exp_id" in r}
+    for exp_id in exp_ids:
+        path = OUTPUTS_DIR / exp_id / "benchmark.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(
+            [r for r in results if r.get("exp_id") == exp_id], indent=2
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=BACKENDS,
+                        help="Benchmark one backend in this process")
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="Print one JSON line")
+    parser.add_argument("--keras-paths", action="store_true",
+                        help="Compare compiled vs uncompiled Keras call paths")
+    args = parser.parse_args()
+
+    if args.keras_paths:
+        for r in benchmark_keras_paths(args.batch_size, args.runs, args.warmup):
+            print(
+                f"{r['path']:18s} p50 {r['latency_p50_ms']:8.3f}ms  "
+                f"p95 {r['latency_p95_ms']:8.3f}ms  {r['images_per_sec']:8.2f} img/s"
+            )
+        return
+
+    if args.backend:
+        result = benchmark_backend(args.backend, args.batch_size, args.runs, args.warmup)
+        print(json.dumps(result) if args.json else json.dumps(result, indent=2))
+        return
+
+    results = compare_backends(batch_size=args.batch_size, runs=args.runs, warmup=args.warmup)
+    save_report(results)
+
+    for r in results:
+        if "error" in r:
+            print(f"{r['backend']:12s} ERROR: {r['error']}")
+            continue
+        print(
+            f"{r['backend']:12s} load {r['load_seconds']:7.3f}s  "
+            f"p50 {r['latency_p50_ms']:8.3f}ms  p95 {r['latency_p95_ms']:8.3f}ms  "
+            f"{r['images_per_sec']:8.2f} img/s  peak RSS {r['peak_rss_mb']} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
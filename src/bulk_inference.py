@@ -0,0 +1,387 @@
+import csv
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+from src.prediction_cache import content_hash, get_prediction_cache, model_cache_id
+from src.preprocessing import IMAGE_EXTENSIONS, ParallelDecoder, load_image, stack_images
+from src.predictor import get_predictor
+from src.utils import BATCH_SIZE, CLASS_NAMES
+
+_DONE = object()
+
+
+# ===============================
+# PIPELINE STAGES
+# ===============================
+
+def iter_image_files(input_dir):
+    """
+    Walk `input_dir` lazily, yielding image paths in a stable order.
+    """
+    for root, dirs, files in os.walk(input_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if Path(name).suffix.lower() in IMAGE_EXTENSIONS:
+                yield str(Path(root) / name)
+
+
+def run_in_background(iterable, maxsize):
+    """
+    Drain `iterable` on a worker thread through a bounded queue so the
+    producer never runs more than `maxsize` items ahead of the consumer.
+    """
+    q = queue.Queue(maxsize=maxsize)
+
+    def worker():
+        try:
+            for item in iterable:
+                q.put(item)
+        except BaseException as e:
+            q.put(e)
+        q.put(_DONE)
+
+    threading.Thread(target=worker, daemon=True).start()
+
+    while True:
+        item = q.get()
+        if item is _DONE:
+            return
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+
+
+def batch_stage(items, batch_size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def make_reader(predictor, cache=None):
+    """
+    Decode function for the bulk pipeline: reads the file once, and on a
+    cache hit returns the stored probabilities without decoding.
+
+    Returns (content_hash, image or None, cached probabilities or None).
+    """
+    model_id = model_cache_id(predictor)
+
+    def read(path):
+        data = Path(path).read_bytes()
+        key = content_hash(data)
+        probs = cache.get(model_id, key) if cache is not None else None
+        if probs is not None:
+            return key, None, probs
+        return key, load_image(data), None
+
+    return read
+
+
+def _record(path, row=None, error=None):
+    if row is None:
+        return {
+            "path": path,
+            "label": None,
+            "confidence": None,
+            "probabilities": None,
+            "error": error,
+        }
+    idx = int(row.argmax())
+    return {
+        "path": path,
+        "label": CLASS_NAMES[idx],
+        "confidence": float(row[idx]),
+        "probabilities": {c: float(p) for c, p in zip(CLASS_NAMES, row)},
+        "error": None,
+    }
+
+
+def _split_batch(batch):
+    """
+    Separate cache hits from images that still need the model.
+
+    Returns (batch, rows {path: probabilities}, todo [(path, key, image)]).
+    """
+    rows = {}
+    todo = []
+    for path, payload, err in batch:
+        if err is not None:
+            continue
+        key, img, cached = payload
+        if cached is not None:
+            rows[path] = cached
+        else:
+            todo.append((path, key, img))
+    return batch, rows, todo
+
+
+def _in_process_map(predictor, timer):
+    def run(xs):
+        for x in xs:
+            start = time.perf_counter()
+            probs = predictor.predict_array(x)
+            timer.add(len(x), time.perf_counter() - start)
+            yield probs
+    return run
+
+
+def _pool_map(predictor, timer):
+    # Batches overlap across workers, so the model stage is timed as the
+    # wall time between consecutive results.
+    def run(xs):
+        last = time.perf_counter()
+        for probs in predictor.map(xs):
+            now = time.perf_counter()
+            timer.add(len(probs), now - last)
+            last = now
+            yield probs
+    return run
+
+
+def predict_stage(batches, predictor, timer, cache=None, streaming=False):
+    """
+    Yield output records per batch, in input order. With `streaming`
+    (an InferencePool, possibly behind the cascade), batches go through
+    predictor.map() so several are in flight at once, one per idle
+    worker; otherwise each runs in-process in turn.
+    """
+    model_id = model_cache_id(predictor)
+    infer = _pool_map(predictor, timer) if streaming else _in_process_map(predictor, timer)
+    prepared = deque()
+
+    def inputs():
+        for batch in batches:
+            item = _split_batch(batch)
+            prepared.append(item)
+            if item[2]:
+                yield stack_images(img for _, _, img in item[2])
+
+    def records(item, probs=None):
+        batch, rows, todo = item
+        if probs is not None:
+            # Rows from a model hot-reloaded mid-run are not cached under the old id
+            if cache is not None and model_cache_id(predictor) == model_id:
+                cache.put_many(model_id, [k for _, k, _ in todo], probs)
+            for (path, _, _), row in zip(todo, probs):
+                rows[path] = row
+        return [_record(path, rows.get(path), err) for path, _, err in batch]
+
+    for probs in infer(inputs()):
+        # Fully cached batches queued ahead of this result go out first
+        while not prepared[0][2]:
+            yield records(prepared.popleft())
+        yield records(prepared.popleft(), probs)
+    while prepared:
+        yield records(prepared.popleft())
+
+
+class StageTimer:
+    def __init__(self):
+        self.images = 0
+        self.seconds = 0.0
+
+    def add(self, images, seconds):
+        self.images += images
+        self.seconds += seconds
+
+    @property
+    def images_per_sec(self):
+        return self.images / self.seconds if self.seconds else None
+
+
+# ===============================
+# OUTPUT / CHECKPOINT
+# ===============================
+
+def _output_format(out_path: Path):
+    return "csv" if out_path.suffix.lower() == ".csv" else "jsonl"
+
+
+def _repair_tail(out_path: Path):
+    """
+    Drop a partially written last line left behind by an interrupted run.
+    """
+    if not out_path.exists() or out_path.stat().st_size == 0:
+        return
+    with open(out_path, "rb+") as f:
+        data = f.read()
+        if data.endswith(b"\n"):
+            return
+        f.truncate(data.rfind(b"\n") + 1)
+
+
+def load_completed(out_path, retry_failed=False):
+    """
+    Paths already present in an existing output file. With
+    `retry_failed`, paths recorded only with an error are left out so
+    they are scored again.
+    """
+    out_path = Path(out_path)
+    if not out_path.exists():
+        return set()
+
+    _repair_tail(out_path)
+    done = set()
+
+    with open(out_path, newline="", encoding="utf-8") as f:
+        if _output_format(out_path) == "csv":
+            records = csv.DictReader(f)
+        else:
+            records = (json.loads(line) for line in f if line.strip())
+        for record in records:
+            if not (retry_failed and record.get("error")):
+                done.add(record["path"])
+    return done
+
+
+class ResultWriter:
+    """
+    Appends prediction records to a JSONL or CSV file, flushing after
+    every batch so the file doubles as the resume checkpoint.
+    """
+
+    def __init__(self, out_path):
+        self.out_path = Path(out_path)
+        self.format = _output_format(self.out_path)
+        self.out_path.parent.mkdir(parents=True, exist_ok=True)
+
+        is_new = not self.out_path.exists() or self.out_path.stat().st_size == 0
+        self._f = open(self.out_path, "a", newline="", encoding="utf-8")
+
+        if self.format == "csv":
+            fields = ["path", "label", "confidence", *CLASS_NAMES, "error"]
+            self._csv = csv.DictWriter(self._f, fieldnames=fields)
+            if is_new:
+                self._csv.writeheader()
+
+    def write(self, records):
+        for r in records:
+            if self.format == "csv":
+                row = {k: r[k] for k in ("path", "label", "confidence", "error")}
+                row.update(r["probabilities"] or {})
+                self._csv.writerow(row)
+            else:
+                self._f.write(json.dumps(r) + "\n")
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+
+# ===============================
+# ENTRY POINT
+# ===============================
+
+def run_bulk_inference(
+    input_dir,
+    out_path,
+    batch_size=BATCH_SIZE,
+    queue_size=4,
+    decode_workers=None,
+    backend="keras",
+    use_cache=True,
+    cascade=False,
+    workers=1,
+    ensemble=0,
+    intra_op_threads=None,
+    inter_op_threads=1,
+    pin=False,
+    retry_failed=False,
+):
+    """
+    Score every image under `input_dir`, appending results to `out_path`.
+
+    Files already recorded in `out_path` are skipped, so an interrupted
+    run resumes where it stopped; with `retry_failed`, files recorded
+    only with an error are scored again. Each stage is connected by a bounded
+    queue, keeping memory flat regardless of folder size. Images seen
+    before by the same model are answered from the prediction cache.
+    With `cascade`, the colour pre-classifier answers clear-cut images
+    and only low-margin ones are sent to the CNN. With `workers` > 1,
+    batches are spread over an InferencePool of model processes, built
+    with the thread counts and pinning the tuner measured. With
+    `ensemble` = k, the top-k registry heads share one in-process
+    backbone pass (`workers` and `backend` are then ignored).
+    """
+    pool = None
+    if ensemble:
+        from src.ensemble import get_ensemble_predictor
+
+        predictor = ensemble_predictor = get_ensemble_predictor(ensemble)
+        backend, workers = predictor.backend_name, 1
+    elif workers > 1:
+        from src.worker_pool import InferencePool
+
+        predictor = pool = InferencePool(
+            workers, backend,
+            intra_op_threads=intra_op_threads,
+            inter_op_threads=inter_op_threads,
+            pin=pin,
+        )
+    else:
+        predictor = get_predictor(backend)
+
+    if cascade:
+        from src.color_cascade import CascadePredictor, ColorCascade
+
+        predictor = CascadePredictor(predictor, ColorCascade.load())
+    cache = get_prediction_cache() if use_cache else None
+    done = load_completed(out_path, retry_failed)
+
+    decoder = ParallelDecoder(
+        workers=decode_workers,
+        max_in_flight=max(batch_size * 2, (decode_workers or 8) * 4),
+        decode_fn=make_reader(predictor, cache),
+    )
+    timer = StageTimer()
+
+    paths = (p for p in iter_image_files(input_dir) if p not in done)
+    decoded = run_in_background(decoder.imap(paths), maxsize=queue_size * batch_size)
+    batches = batch_stage(decoded, batch_size)
+    results = predict_stage(batches, predictor, timer, cache, streaming=pool is not None)
+
+    writer = ResultWriter(out_path)
+    scored = failed = 0
+    start = time.perf_counter()
+
+    try:
+        for records in results:
+            writer.write(records)
+            failed += sum(r["error"] is not None for r in records)
+            scored += len(records)
+    finally:
+        writer.close()
+        if pool is not None:
+            pool.close()
+
+    elapsed = time.perf_counter() - start
+    return {
+        "exp_id": predictor.exp_id,
+        "backend": backend,
+        "workers": workers,
+        "skipped": len(done),
+        "scored": scored,
+        "failed": failed,
+        "seconds": round(elapsed, 2),
+        "images_per_sec": round(scored / elapsed, 2) if elapsed else None,
+        "decode_workers": decoder.workers,
+        "decode_images_per_sec": _round(decoder.images_per_sec),
+        "model_images_per_sec": _round(timer.images_per_sec),
+        "cache": cache.stats() if cache is not None else None,
+        "cascade": predictor.stats() if cascade else None,
+        "ensemble": ensemble_predictor.stats() if ensemble else None,
+    }
+
+
+def _round(value):
+    return round(value, 2) if value is not None else None
@@ -0,0 +1,368 @@
+import argparse
+import json
+import threading
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+from src.predictor import OUTPUTS_DIR, get_predictor
+from src.preprocessing import ParallelDecoder, list_labelled_images, load_image, stack_images
+from src.utils import BATCH_SIZE, CLASS_NAMES, SEED, TRAIN_DIR, VAL_DIR
+
+CASCADE_PATH = OUTPUTS_DIR / "color_cascade" / "color_cascade.json"
+
+HUE_BINS = 16
+VALUE_BINS = 4
+SAMPLE_STRIDE = 4
+
+
+# ===============================
+# FEATURES
+# ===============================
+
+def rgb_to_hsv(rgb):
+    """
+    Vectorised RGB (uint8, any leading shape) -> H, S, V in [0, 1].
+    """
+    rgb = rgb.astype(np.float32) / 255.0
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    maxc = rgb.max(axis=-1)
+    minc = rgb.min(axis=-1)
+    delta = maxc - minc
+    safe = np.where(delta == 0, 1.0, delta)
+
+    h = np.where(
+        maxc == r, (g - b) / safe,
+        np.where(maxc == g, 2.0 + (b - r) / safe, 4.0 + (r - g) / safe),
+    )
+    h = np.where(delta == 0, 0.0, (h / 6.0) % 1.0)
+    s = np.where(maxc == 0, 0.0, delta / np.where(maxc == 0, 1.0, maxc))
+    return h, s, maxc
+
+
+def color_features(batch):
+    """
+    (N, H, W, 3) uint8 batch -> (N, F) peel colour features.
+
+    Pixels are subsampled, background (bright, unsaturated) is masked
+    out, and the remaining peel pixels are summarised as a hue histogram,
+    a brightness histogram and the fraction of dark pixels.
+    """
+    batch = np.asarray(batch)[:, ::SAMPLE_STRIDE, ::SAMPLE_STRIDE]
+    n = len(batch)
+    h, s, v = rgb_to_hsv(batch)
+    h, s, v = h.reshape(n, -1), s.reshape(n, -1), v.reshape(n, -1)
+
+    peel = ((s > 0.2) | (v < 0.3)).astype(np.float32)
+    weight = peel.sum(axis=1, keepdims=True)
+    weight = np.maximum(weight, 1.0)
+
+    rows = np.arange(n)[:, None]
+    hue_idx = np.minimum((h * HUE_BINS).astype(np.int64), HUE_BINS - 1)
+    val_idx = np.minimum((v * VALUE_BINS).astype(np.int64), VALUE_BINS - 1)
+
+    hue_hist = np.bincount(
+        (rows * HUE_BINS + hue_idx).ravel(), weights=peel.ravel(),
+        minlength=n * HUE_BINS,
+    ).reshape(n, HUE_BINS)
+    val_hist = np.bincount(
+        (rows * VALUE_BINS + val_idx).ravel(), weights=peel.ravel(),
+        minlength=n * VALUE_BINS,
+    ).reshape(n, VALUE_BINS)
+
+    dark = ((v < 0.3) * peel).sum(axis=1, keepdims=True)
+    coverage = weight / h.shape[1]
+
+    return np.hstack([hue_hist / weight, val_hist / weight, dark / weight, coverage])
+
+
+def _softmax(z):
+    z = z - z.max(axis=1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=1, keepdims=True)
+
+
+# ===============================
+# CLASSIFIER
+# ===============================
+
+class ColorCascade:
+    """
+    Multinomial logistic regression on colour features, plus a per-class
+    minimum margin (top-1 minus top-2 probability) above which its
+    answer is trusted without running the CNN.
+    """
+
+    def __init__(self, weights, bias, mean, std, thresholds, report=None):
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.bias = np.asarray(bias, dtype=np.float32)
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.std = np.asarray(std, dtype=np.float32)
+        self.thresholds = np.asarray(thresholds, dtype=np.float32)
+        self.report = report or {}
+
+    @classmethod
+    def fit(cls, features, labels, epochs=500, lr=0.5, l2=1e-3):
+        mean = features.mean(axis=0)
+        std = features.std(axis=0) + 1e-6
+        x = (features - mean) / std
+        y = np.eye(len(CLASS_NAMES), dtype=np.float32)[labels]
+
+        w = np.zeros((x.shape[1], len(CLASS_NAMES)), dtype=np.float32)
+        b = np.zeros(len(CLASS_NAMES), dtype=np.float32)
+        for _ in range(epochs):
+            grad = _softmax(x @ w + b) - y
+            w -= lr * (x.T @ grad / len(x) + l2 * w)
+            b -= lr * grad.mean(axis=0)
+
+        return cls(w, b, mean, std, np.full(len(CLASS_NAMES), np.inf))
+
+    def predict_features(self, features):
+        """
+        Returns:
+            probabilities (N, num_classes)
+            confident (N,) bool, True where the cheap answer is trusted
+        """
+        probs = _softmax(((features - self.mean) / self.std) @ self.weights + self.bias)
+        top2 = np.sort(probs, axis=1)[:, -2:]
+        margin = top2[:, 1] - top2[:, 0]
+        confident = margin >= self.thresholds[probs.argmax(axis=1)]
+        return probs, confident
+
+    def calibrate(self, features, labels, target_accuracy=0.99, min_support=20):
+        """
+        Per predicted class, pick the lowest margin threshold at which the
+        cheap stage is still at least `target_accuracy` correct on the
+        validation split. Classes that never reach it always go to the CNN.
+        """
+        probs, _ = self.predict_features(features)
+        pred = probs.argmax(axis=1)
+        top2 = np.sort(probs, axis=1)[:, -2:]
+        margin = top2[:, 1] - top2[:, 0]
+
+        thresholds = np.full(len(CLASS_NAMES), np.inf, dtype=np.float32)
+        for c in range(len(CLASS_NAMES)):
+            idx = np.where(pred == c)[0]
+            if len(idx) < min_support:
+                continue
+            order = idx[np.argsort(-margin[idx])]
+            correct = np.cumsum(labels[order] == c)
+            accuracy = correct / np.arange(1, len(order) + 1)
+            ok = np.where((accuracy >= target_accuracy) & (np.arange(1, len(order) + 1) >= min_support))[0]
+            if len(ok):
+                thresholds[c] = margin[order[ok[-1]]]
+        self.thresholds = thresholds
+
+    def save(self, path=CASCADE_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({
+            "weights": self.weights.tolist(),
+            "bias": self.bias.tolist(),
+            "mean": self.mean.tolist(),
+            "std": self.std.tolist(),
+            "thresholds": [None if np.isinf(t) else float(t) for t in self.thresholds],
+            "report": self.report,
+        }, indent=2))
+
+    @classmethod
+    def load(cls, path=CASCADE_PATH):
+        if not path.exists():
+            raise FileNotFoundError(
+                f"{path} missing. Run: python -m src.color_cascade --calibrate"
+            )
+        data = json.loads(path.read_text())
+        thresholds = [np.inf if t is None else t for t in data["thresholds"]]
+        return cls(data["weights"], data["bias"], data["mean"], data["std"],
+                   thresholds, data.get("report"))
+
+
+# ===============================
+# CASCADE PREDICTOR
+# ===============================
+
+class CascadePredictor:
+    """
+    Drop-in wrapper around a Predictor: confident colour-stage answers are
+    returned directly and only the remaining rows reach the CNN.
+    """
+
+    def __init__(self, predictor, cascade):
+        self.predictor = predictor
+        self.cascade = cascade
+        self.cheap_served = 0
+        self.cnn_served = 0
+        self._lock = threading.Lock()
+
+    @property
+    def exp_id(self):
+        return self.predictor.exp_id
+
+    @property
+    def backend_name(self):
+        return f"{self.predictor.backend_name}+cascade"
+
+    @property
+    def model_path(self):
+        return self.predictor.model_path
+
+    accepts_encoded = False
+
+    def predict_array(self, x):
+        probs, confident = self.cascade.predict_features(color_features(x))
+        probs = probs.astype(np.float32)
+
+        if not confident.all():
+            probs[~confident] = self.predictor.predict_array(x[~confident])
+
+        with self._lock:
+            self.cheap_served += int(confident.sum())
+            self.cnn_served += int((~confident).sum())
+        return probs
+
+    def map(self, batches):
+        """
+        Streaming predict_array over many batches: the uncertain rows of
+        each go through the wrapped predictor's map() (an InferencePool
+        keeps several in flight), results come back in input order.
+        """
+        inner_map = getattr(self.predictor, "map", None)
+        if inner_map is None:
+            inner_map = lambda xs: (self.predictor.predict_array(x) for x in xs)
+        pending = deque()
+
+        def uncertain():
+            for x in batches:
+                probs, confident = self.cascade.predict_features(color_features(x))
+                pending.append((probs.astype(np.float32), confident))
+                with self._lock:
+                    self.cheap_served += int(confident.sum())
+                    self.cnn_served += int((~confident).sum())
+                if not confident.all():
+                    yield x[~confident]
+
+        for cnn in inner_map(uncertain()):
+            while pending[0][1].all():
+                yield pending.popleft()[0]
+            probs, confident = pending.popleft()
+            probs[~confident] = cnn
+            yield probs
+        while pending:
+            yield pending.popleft()[0]
+
+    def predict_encoded(self, blobs):
+        return self.predict_array(stack_images(load_image(b) for b in blobs))
+
+    def stats(self):
+        total = self.cheap_served + self.cnn_served
+        return {
+            "cheap_served": self.cheap_served,
+            "cnn_served": self.cnn_served,
+            "cheap_fraction": round(self.cheap_served / total, 4) if total else None,
+            "calibration": self.cascade.report,
+        }
+
+
+def get_cascade_predictor(backend="keras"):
+    return CascadePredictor(get_predictor(backend), ColorCascade.load())
+
+
+# ===============================
+# CALIBRATION
+# ===============================
+
+def split_features(split_dir, batch_size=BATCH_SIZE, predictor=None):
+    """
+    Colour features (and optionally CNN probabilities) for a labelled split.
+    """
+    paths, labels = list_labelled_images(split_dir)
+    if not paths:
+        raise FileNotFoundError(f"No labelled images found in {split_dir}")
+
+    feats, cnn = [], []
+    images = []
+    for path, img, err in ParallelDecoder().imap(paths):
+        if err is not None:
+            raise ValueError(f"Could not decode {path}: {err}")
+        images.append(img)
+        if len(images) == batch_size:
+            x = stack_images(images)
+            feats.append(color_features(x))
+            if predictor is not None:
+                cnn.append(predictor.predict_array(x))
+            images = []
+    if images:
+        x = stack_images(images)
+        feats.append(color_features(x))
+        if predictor is not None:
+            cnn.append(predictor.predict_array(x))
+
+    return np.vstack(feats), labels, (np.vstack(cnn) if cnn else None)
+
+
+def calibrate_cascade(target_accuracy=0.99, backend="keras", report_fraction=0.5, seed=SEED):
+    """
+    Fit on TRAIN_DIR, calibrate thresholds on part of VAL_DIR, and report
+    on the held-out rest how much traffic the cheap stage absorbs and
+    what that costs in accuracy compared with the CNN alone.
+    """
+    train_x, train_y, _ = split_features(TRAIN_DIR)
+    cascade = ColorCascade.fit(train_x, train_y)
+
+    predictor = get_predictor(backend)
+    val_x, val_y, cnn_probs = split_features(VAL_DIR, predictor=predictor)
+    val_y = np.asarray(val_y)
+
+    order = np.random.default_rng(seed).permutation(len(val_y))
+    n_report = int(len(order) * report_fraction)
+    calib, held_out = order[n_report:], order[:n_report]
+    if len(calib) == 0 or len(held_out) == 0:
+        # Tiny splits: report on everything rather than nothing
+        calib = held_out = order
+    cascade.calibrate(val_x[calib], val_y[calib], target_accuracy)
+
+    val_x, val_y, cnn_probs = val_x[held_out], val_y[held_out], cnn_probs[held_out]
+    probs, confident = cascade.predict_features(val_x)
+    cheap_pred = probs.argmax(axis=1)
+    cnn_pred = cnn_probs.argmax(axis=1)
+    cascade_pred = np.where(confident, cheap_pred, cnn_pred)
+
+    cascade.report = {
+        "exp_id": predictor.exp_id,
+        "target_accuracy": target_accuracy,
+        "calibration_images": int(len(calib)),
+        "report_images": int(len(held_out)),
+        "cheap_fraction": round(float(confident.mean()), 4),
+        "cheap_accuracy_on_served": (
+            round(float((cheap_pred[confident] == val_y[confident]).mean()), 4)
+            if confident.any() else None
+        ),
+        "cnn_accuracy": round(float((cnn_pred == val_y).mean()), 4),
+        "cascade_accuracy": round(float((cascade_pred == val_y).mean()), 4),
+        "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    cascade.report["accuracy_cost"] = round(
+        cascade.report["cnn_accuracy"] - cascade.report["cascade_accuracy"], 4
+    )
+    cascade.save()
+    return cascade
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calibrate", action="store_true",
+                        help="Fit on train, calibrate routing thresholds on part of valid "
+                             "and report on the rest")
+    parser.add_argument("--target-accuracy", type=float, default=0.99)
+    parser.add_argument("--backend", default="keras")
+    args = parser.parse_args()
+
+    if args.calibrate:
+        cascade = calibrate_cascade(args.target_accuracy, args.backend)
+    else:
+        cascade = ColorCascade.load()
+    print(json.dumps(cascade.report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+import argparse
+import io
+import json
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from src.color_cascade import rgb_to_hsv
+from src.predictor import decode_predictions, get_predictor
+from src.shelf_life import ADVICE, estimate_shelf_life_batch
+from src.utils import IMG_SIZE
+
+# Crate photos are decoded at most this large; crops come from this image.
+WORK_MAX_SIDE = 1024
+# The mask is computed on the working image subsampled by this stride.
+MASK_STRIDE = 4
+
+# Peel pixels: saturated green-to-yellow-to-brown hues, or dark spots/peel.
+PEEL_HUE_RANGE = (0.03, 0.40)
+PEEL_MIN_SATURATION = 0.25
+DARK_MAX_VALUE = 0.25
+
+MIN_AREA_FRACTION = 0.005
+BOX_PADDING = 0.08
+
+
+# ===============================
+# SEGMENTATION
+# ===============================
+
+def load_working_image(source, max_side=WORK_MAX_SIDE):
+    """
+    Decode a crate photo (path, bytes, PIL image or array) to an RGB uint8
+    array no larger than `max_side`, using JPEG draft decoding when possible.
+
+    Returns:
+        rgb (np.ndarray)
+        scale (float) original pixels per working-image pixel
+    """
+    if isinstance(source, np.ndarray):
+        img = Image.fromarray(np.asarray(source, dtype=np.uint8))
+    elif isinstance(source, Image.Image):
+        img = source
+    else:
+        if isinstance(source, (bytes, bytearray)):
+            source = io.BytesIO(source)
+        img = Image.open(source)
+    original_width = img.width
+
+    if img.format == "JPEG":
+        img.draft("RGB", (max_side, max_side))
+
+    img = img.convert("RGB")
+    if max(img.size) > max_side:
+        img.thumbnail((max_side, max_side))
+    return np.asarray(img, dtype=np.uint8), original_width / img.width
+
+
+def banana_mask(rgb):
+    """
+    Boolean (H, W) mask of likely banana peel pixels.
+    """
+    h, s, v = rgb_to_hsv(rgb)
+    lo, hi = PEEL_HUE_RANGE
+    peel = (s >= PEEL_MIN_SATURATION) & (h >= lo) & (h <= hi)
+    dark = (v <= DARK_MAX_VALUE) & (s >= 0.15)
+    return peel | dark
+
+
+def find_bananas(rgb, min_area=MIN_AREA_FRACTION, padding=BOX_PADDING):
+    """
+    Bounding boxes (x0, y0, x1, y1) of connected peel regions, in the
+    coordinates of `rgb`, largest first.
+    """
+    from scipy import ndimage
+
+    small = rgb[::MASK_STRIDE, ::MASK_STRIDE]
+    mask = banana_mask(small)
+    mask = ndimage.binary_opening(mask, iterations=1)
+    mask = ndimage.binary_closing(mask, iterations=2)
+    mask = ndimage.binary_fill_holes(mask)
+
+    labels, count = ndimage.label(mask)
+    if count == 0:
+        return []
+
+    areas = np.bincount(labels.ravel(), minlength=count + 1)[1:]
+    min_pixels = min_area * mask.size
+
+    boxes = []
+    height, width = rgb.shape[:2]
+    for idx, sl in enumerate(ndimage.find_objects(labels)):
+        if sl is None or areas[idx] < min_pixels:
+            continue
+        y0, y1 = sl[0].start * MASK_STRIDE, sl[0].stop * MASK_STRIDE
+        x0, x1 = sl[1].start * MASK_STRIDE, sl[1].stop * MASK_STRIDE
+        pad_x, pad_y = int((x1 - x0) * padding), int((y1 - y0) * padding)
+        boxes.append((
+            int(areas[idx]),
+            (max(0, x0 - pad_x), max(0, y0 - pad_y),
+             min(width, x1 + pad_x), min(height, y1 + pad_y)),
+        ))
+
+    boxes.sort(key=lambda b: -b[0])
+    return [box for _, box in boxes]
+
+
+def crop_batch(rgb, boxes, size=IMG_SIZE):
+    """
+    Stack every box of `rgb`, resized to the model input size, into one
+    (N, H, W, 3) uint8 batch.
+    """
+    batch = np.empty((len(boxes), size[1], size[0], 3), dtype=np.uint8)
+    img = Image.fromarray(rgb)
+    for i, box in enumerate(boxes):
+        batch[i] = np.asarray(img.crop(box).resize(size), dtype=np.uint8)
+    return batch
+
+
+# ===============================
+# PREDICTION
+# ===============================
+
+def predict_crate(source, backend="keras", min_area=MIN_AREA_FRACTION):
+    """
+    Classify every banana in a crate photo with a single batched model
+    call. Falls back to the whole frame when no banana is segmented.
+
+    Returns a list of dicts with box (in original image pixels), label,
+    confidence, days_left and advice, one per banana, largest first.
+    """
+    rgb, scale = load_working_image(source)
+    boxes = find_bananas(rgb, min_area=min_area)
+    if not boxes:
+        boxes = [(0, 0, rgb.shape[1], rgb.shape[0])]
+
+    probs = get_predictor(backend).predict_array(crop_batch(rgb, boxes))
+    labels, confidences = decode_predictions(probs)
+
+    days, codes = estimate_shelf_life_batch(probs)
+
+    bananas = []
+    for box, label, conf, days_left, code in zip(boxes, labels, confidences, days, codes):
+        bananas.append({
+            "box": [round(c * scale) for c in box],
+            "label": str(label),
+            "confidence": round(float(conf), 4),
+            "days_left": round(float(days_left), 2),
+            "advice": ADVICE[code],
+        })
+    return bananas
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("image", help="Crate photo")
+    parser.add_argument("--backend", default="keras")
+    parser.add_argument("--min-area", type=float, default=MIN_AREA_FRACTION,
+                        help="Smallest banana as a fraction of the frame")
+    args = parser.parse_args()
+
+    bananas = predict_crate(Path(args.image), args.backend, args.min_area)
+    print(json.dumps(bananas, indent=2))
+
+
+if __name__ == "__main__":
+    main()
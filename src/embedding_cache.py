@@ -0,0 +1,240 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+from src.model_parts import apply_head, backbone_model, cached_head
+from src.prediction_cache import content_hash
+from src.predictor import OUTPUTS_DIR, resolve_model_path
+from src.preprocessing import ParallelDecoder, list_labelled_images, stack_images
+from src.registry_manager import load_registry
+from src.utils import BATCH_SIZE
+
+CACHE_DIR = OUTPUTS_DIR / "embedding_cache"
+
+
+@contextmanager
+def _file_lock(path):
+    """
+    Exclusive inter-process lock held on `path` for the duration.
+    """
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class EmbeddingCache:
+    """
+    Pooled backbone features per image, keyed by the image content hash.
+
+    Features live in one append-only float16 file opened as a read-only
+    memmap. The index is an append-only JSONL file with one
+    {"start", "dim", "keys"} record per written batch. The cache directory
+    is named after the backbone fingerprint, so features are only ever
+    shared between models whose frozen trunks are byte-identical.
+
+    Writers hold a lock file, take row numbers from what the index
+    covers, and write features before their index record. Feature
+    bytes no index record covers (a writer that died in between) are
+    truncated away, so a row can never point at another image's features.
+    """
+
+    def __init__(self, fingerprint, root=CACHE_DIR):
+        self.dir = Path(root) / fingerprint
+        self.features_path = self.dir / "features.f16"
+        self.index_path = self.dir / "index.jsonl"
+        self.lock_path = self.dir / "cache.lock"
+        self.dir.mkdir(parents=True, exist_ok=True)
+
+        self.dim = None
+        self.rows = {}
+        self.n_rows = 0
+        self._index_offset = 0
+
+        with _file_lock(self.lock_path):
+            self._migrate_legacy_index()
+            self._sync()
+            self._truncate_orphans()
+
+    def _migrate_legacy_index(self):
+        legacy = self.dir / "index.json"
+        if not legacy.exists() or self.index_path.exists():
+            return
+        index = json.loads(legacy.read_text())
+        keys = sorted(index["rows"], key=index["rows"].get)
+        if keys:
+            record = {"start": 0, "dim": index["dim"], "keys": keys}
+            self.index_path.write_text(json.dumps(record) + "\n")
+        legacy.unlink()
+
+    def _sync(self):
+        """
+        Read index records appended (by any process) since the last sync.
+        A partially written last line is left for a later sync.
+        """
+        if not self.index_path.exists():
+            return
+        with open(self.index_path, "rb") as f:
+            f.seek(self._index_offset)
+            data = f.read()
+        complete = data[:data.rfind(b"\n") + 1]
+        for line in complete.splitlines():
+            record = json.loads(line)
+            self.dim = self.dim or record["dim"]
+            for i, key in enumerate(record["keys"]):
+                self.rows[key] = record["start"] + i
+            self.n_rows = max(self.n_rows, record["start"] + len(record["keys"]))
+        self._index_offset += len(complete)
+
+    def _row_bytes(self):
+        return self.dim * np.dtype(np.float16).itemsize
+
+    def _truncate_orphans(self):
+        """
+        Drop feature rows (and a torn index line) that no complete index
+        record covers. Caller holds the lock.
+        """
+        if self.index_path.exists() and self.index_path.stat().st_size > self._index_offset:
+            with open(self.index_path, "rb+") as f:
+                f.truncate(self._index_offset)
+        if self.features_path.exists():
+            indexed = self.n_rows * self._row_bytes() if self.dim else 0
+            if self.features_path.stat().st_size > indexed:
+                with open(self.features_path, "rb+") as f:
+                    f.truncate(indexed)
+
+    def _memmap(self):
+        return np.memmap(
+            self.features_path, dtype=np.float16, mode="r",
+            shape=(self.n_rows, self.dim),
+        )
+
+    def _append(self, keys, features):
+        features = np.ascontiguousarray(features, dtype=np.float16)
+
+        with _file_lock(self.lock_path):
+            self._sync()
+            self._truncate_orphans()
+            self.dim = self.dim or features.shape[1]
+            start = self.n_rows
+
+            with open(self.features_path, "ab") as f:
+                f.write(features.tobytes())
+            record = {"start": start, "dim": self.dim, "keys": list(keys)}
+            with open(self.index_path, "ab") as f:
+                f.write((json.dumps(record) + "\n").encode())
+            self._sync()
+
+    def features(self, paths, backbone_loader, batch_size=BATCH_SIZE):
+        """
+        (N, D) float16 features for `paths`. Only images missing from the
+        cache are decoded and pushed through the backbone, which is
+        loaded lazily via `backbone_loader()` on the first miss.
+        """
+        self._sync()
+        keys = [content_hash(Path(p).read_bytes()) for p in paths]
+        missing = {}
+        for key, path in zip(keys, paths):
+            if key not in self.rows:
+                missing.setdefault(key, path)
+
+        if missing:
+            backbone = backbone_loader()
+            decoder = ParallelDecoder()
+            pending_keys, images = [], []
+
+            for key, (path, img, err) in zip(missing, decoder.imap(missing.values())):
+                if err is not None:
+                    raise ValueError(f"Could not decode {path}: {err}")
+                pending_keys.append(key)
+                images.append(img)
+                if len(images) == batch_size:
+                    self._append(pending_keys, backbone(stack_images(images)))
+                    pending_keys, images = [], []
+            if images:
+                self._append(pending_keys, backbone(stack_images(images)))
+
+        if not keys:
+            return np.empty((0, self.dim or 0), dtype=np.float16)
+        return self._memmap()[[self.rows[k] for k in keys]]
+
+
+# ===============================
+# EVALUATION OF ALL HEADS
+# ===============================
+
+def _backbone_loader(model_path):
+    def load():
+        from src.backends import compile_inference_fn
+        from src.fast_model import load_model_artifact
+
+        infer = compile_inference_fn(backbone_model(load_model_artifact(model_path)))
+        return lambda x: infer(np.asarray(x, dtype=np.float32)).numpy()
+    return load
+
+
+def evaluate_experiments(split_dir, batch_size=BATCH_SIZE):
+    """
+    Accuracy and loss of every registered experiment on a labelled split,
+    running the shared MobileNetV2 trunk at most once per image ever and
+    only each experiment's Dense head per call.
+    """
+    paths, labels = list_labelled_images(split_dir)
+    if not paths:
+        raise FileNotFoundError(f"No labelled images found in {split_dir}")
+
+    registry = load_registry()
+    results = []
+    caches = {}
+
+    for entry in registry.get("models", []):
+        exp_id = entry["exp_id"]
+        try:
+            model_path = resolve_model_path(exp_id, registry)
+        except FileNotFoundError as e:
+            results.append({"exp_id": exp_id, "error": str(e)})
+            continue
+
+        start = time.perf_counter()
+        head, fingerprint = cached_head(exp_id, model_path)
+
+        if fingerprint not in caches:
+            cache = EmbeddingCache(fingerprint)
+            caches[fingerprint] = cache.features(
+                paths, _backbone_loader(model_path), batch_size
+            )
+        features = caches[fingerprint]
+
+        probs = apply_head(features, head)
+        eps = 1e-7
+        loss = float(-np.log(probs[np.arange(len(labels)), labels] + eps).mean())
+        accuracy = float((probs.argmax(axis=1) == labels).mean())
+
+        results.append({
+            "exp_id": exp_id,
+            "accuracy": round(accuracy, 4),
+            "loss": round(loss, 4),
+            "images": len(paths),
+            "backbone": fingerprint,
+            "seconds": round(time.perf_counter() - start, 3),
+        })
+
+    return results
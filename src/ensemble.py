@@ -0,0 +1,309 @@
+import argparse
+import json
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.embedding_cache import EmbeddingCache
+from src.model_parts import apply_head, backbone_model, cached_head, is_head_artifact
+from src.predictor import _file_signature, resolve_model_path
+from src.preprocessing import list_labelled_images, load_image, stack_images
+from src.registry_manager import REGISTRY_PATH, load_registry
+from src.utils import BATCH_SIZE
+
+COMBINE_METHODS = ("mean", "weighted")
+# Only experiments that could be production (see set_production_model)
+MEMBER_MODE = "full"
+
+
+# ===============================
+# MEMBER SELECTION
+# ===============================
+
+def select_members(k, registry=None):
+    """
+    Best `k` registered full-mode experiments by val_accuracy that have a
+    model file and share the backbone of the best one. Dev-mode runs are
+    never ensembled into what gets served.
+
+    Returns a list of {exp_id, val_accuracy, model_path, head, fingerprint}.
+    """
+    registry = registry or load_registry()
+    ranked = sorted(
+        (m for m in registry.get("models", []) if m.get("mode") == MEMBER_MODE),
+        key=lambda m: m.get("val_accuracy", 0),
+        reverse=True,
+    )
+
+    members = []
+    for entry in ranked:
+        exp_id = entry["exp_id"]
+        try:
+            model_path = resolve_model_path(exp_id, registry)
+        except FileNotFoundError:
+            continue
+
+        head, fingerprint = cached_head(exp_id, model_path)
+        # Heads are only interchangeable on byte-identical trunks
+        if members and fingerprint != members[0]["fingerprint"]:
+            continue
+
+        members.append({
+            "exp_id": exp_id,
+            "val_accuracy": float(entry.get("val_accuracy", 0)),
+            "model_path": model_path,
+            "head": head,
+            "fingerprint": fingerprint,
+        })
+        if len(members) == k:
+            break
+
+    if not members:
+        raise FileNotFoundError(f"No registered {MEMBER_MODE}-mode experiment has a model file")
+    return members
+
+
+def member_weights(members, combine="mean"):
+    if combine not in COMBINE_METHODS:
+        raise ValueError(f"Unknown combine method '{combine}'. Choose from {COMBINE_METHODS}")
+    if combine == "weighted":
+        w = np.array([m["val_accuracy"] for m in members], dtype=np.float32)
+        if w.sum() > 0:
+            return w / w.sum()
+    return np.full(len(members), 1.0 / len(members), dtype=np.float32)
+
+
+def _load_backbone(member, registry=None):
+    """
+    Compiled raw-pixels -> pooled-features function of a member's model.
+    """
+    from src.backends import compile_inference_fn
+    from src.fast_model import shared_features_fn
+    from src.model_export import load_keras_model
+
+    if is_head_artifact(member["model_path"]):
+        return shared_features_fn(member["fingerprint"])
+    infer = compile_inference_fn(backbone_model(load_keras_model(member["exp_id"], registry)))
+    return lambda x: infer(np.asarray(x, dtype=np.float32)).numpy()
+
+
+# ===============================
+# ENSEMBLE PREDICTOR
+# ===============================
+
+class _LoadedEnsemble:
+    def __init__(self, members, weights, features):
+        self.members = members
+        self.weights = weights
+        self.features = features
+
+
+class EnsemblePredictor:
+    """
+    Top-k registry models served as one model.
+
+    The shared MobileNetV2 trunk runs once per batch and every member's
+    Dense head is applied to the pooled features in NumPy, so k members
+    cost about one forward pass. Probabilities are averaged, optionally
+    weighted by val_accuracy. Drop-in for Predictor.predict_array.
+
+    Like Predictor, the registry file is re-checked at most every
+    `check_interval` seconds and the members are re-selected when it
+    changed. A `registry` dict passed in is a fixed snapshot instead.
+    """
+
+    backend_name = "keras+ensemble"
+    accepts_encoded = False
+
+    def __init__(self, k=3, combine="mean", registry=None,
+                 registry_path=REGISTRY_PATH, check_interval=2.0):
+        self.k = k
+        self.combine = combine
+        self.registry_path = Path(registry_path)
+        self.check_interval = None if registry is not None else check_interval
+        self._state = None
+        self._registry_signature = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self.refresh(force=True, registry=registry)
+
+    # ---------- loading ----------
+
+    def _current(self):
+        if (
+            self.check_interval is not None
+            and time.monotonic() - self._last_check >= self.check_interval
+        ):
+            self.refresh()
+        return self._state
+
+    def refresh(self, force=False, registry=None):
+        """
+        Re-select the members if the registry changed. Returns True on reload.
+        """
+        with self._lock:
+            self._last_check = time.monotonic()
+            if registry is None:
+                signature = _file_signature(self.registry_path)
+                if not force and signature == self._registry_signature:
+                    return False
+                with open(self.registry_path) as f:
+                    registry = json.load(f)
+                self._registry_signature = signature
+
+            members = select_members(self.k, registry)
+            state = self._state
+            if state is not None and state.members[0]["fingerprint"] == members[0]["fingerprint"]:
+                features = state.features  # same trunk, keep the traced backbone
+            else:
+                features = _load_backbone(members[0], registry)
+            self._state = _LoadedEnsemble(members, member_weights(members, self.combine), features)
+            return True
+
+    @property
+    def members(self):
+        return self._current().members
+
+    @property
+    def weights(self):
+        return self._current().weights
+
+    @property
+    def _features(self):
+        return self._current().features
+
+    @property
+    def exp_id(self):
+        return "+".join(m["exp_id"] for m in self.members)
+
+    @property
+    def model_path(self):
+        return self.members[0]["model_path"]
+
+    # ---------- inference ----------
+
+    def member_probs(self, features, state=None):
+        """
+        (k, N, num_classes) probabilities of every member from pooled features.
+        """
+        state = state or self._current()
+        return np.stack([apply_head(features, m["head"]) for m in state.members])
+
+    def combine_probs(self, member_probs, state=None):
+        state = state or self._current()
+        return np.tensordot(state.weights, member_probs, axes=1).astype(np.float32)
+
+    def predict_array(self, x):
+        # One snapshot, so a refresh mid-batch cannot mix members and weights
+        state = self._current()
+        return self.combine_probs(self.member_probs(state.features(x), state), state)
+
+    def predict_encoded(self, blobs):
+        return self.predict_array(stack_images(load_image(b) for b in blobs))
+
+    def stats(self):
+        state = self._current()
+        return {
+            "combine": self.combine,
+            "members": [
+                {"exp_id": m["exp_id"], "val_accuracy": m["val_accuracy"], "weight": round(float(w), 4)}
+                for m, w in zip(state.members, state.weights)
+            ],
+        }
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def get_ensemble_predictor(k=3, combine="mean") -> EnsemblePredictor:
+    """
+    Process-wide EnsemblePredictor per (k, combine). It re-selects its
+    members when the registry file changes.
+    """
+    with _shared_lock:
+        if (k, combine) not in _shared:
+            _shared[(k, combine)] = EnsemblePredictor(k, combine)
+        return _shared[(k, combine)]
+
+
+# ===============================
+# EVALUATION
+# ===============================
+
+def evaluate_ensemble(split_dir, k=3, combine="mean", batch_size=BATCH_SIZE):
+    """
+    Accuracy of each member and of the ensemble on a labelled split.
+    Pooled features come from the embedding cache, so the trunk runs at
+    most once per image.
+    """
+    paths, labels = list_labelled_images(split_dir)
+    if not paths:
+        raise FileNotFoundError(f"No labelled images found in {split_dir}")
+
+    ensemble = EnsemblePredictor(k, combine)
+    cache = EmbeddingCache(ensemble.members[0]["fingerprint"])
+    features = cache.features(paths, lambda: ensemble._features, batch_size)
+
+    member_probs = ensemble.member_probs(features)
+    probs = ensemble.combine_probs(member_probs)
+    labels = np.asarray(labels)
+
+    def accuracy(p):
+        return round(float((p.argmax(axis=1) == labels).mean()), 4)
+
+    return {
+        "images": len(paths),
+        "combine": combine,
+        "members": [
+            {"exp_id": m["exp_id"], "accuracy": accuracy(p)}
+            for m, p in zip(ensemble.members, member_probs)
+        ],
+        "ensemble_accuracy": accuracy(probs),
+    }
+
+
+def time_ensemble(k=3, combine="mean", batch_size=16, runs=20, warmup=3):
+    """
+    Per-batch latency of one production model versus the k-head ensemble.
+    """
+    from src.benchmark import summarize_latencies, synthetic_batch, time_calls
+    from src.predictor import get_predictor
+
+    x = synthetic_batch(batch_size)
+    ensemble = EnsemblePredictor(k, combine)
+    single = get_predictor("keras")
+
+    results = {
+        "members": len(ensemble.members),
+        "batch_size": batch_size,
+        "single": summarize_latencies(time_calls(single.predict_array, x, runs, warmup), batch_size),
+        "ensemble": summarize_latencies(time_calls(ensemble.predict_array, x, runs, warmup), batch_size),
+    }
+    # What k separate full models would cost
+    results["k_full_passes_p50_ms"] = round(results["single"]["latency_p50_ms"] * len(ensemble.members), 3)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--k", type=int, default=3, help="Number of top registry models")
+    parser.add_argument("--combine", default="mean", choices=COMBINE_METHODS)
+    parser.add_argument("--split", help="Labelled folder to evaluate members and ensemble on")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Time the ensemble against a single model")
+    parser.add_argument("--batch-size", type=int, default=16)
+    args = parser.parse_args()
+
+    if args.split:
+        print(json.dumps(evaluate_ensemble(args.split, args.k, args.combine), indent=2))
+    if args.benchmark:
+        print(json.dumps(time_ensemble(args.k, args.combine, args.batch_size), indent=2))
+    if not (args.split or args.benchmark):
+        print(json.dumps(EnsemblePredictor(args.k, args.combine).stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
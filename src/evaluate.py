@@ -1,10 +1,16 @@
-﻿import tensorflow as tf
-from tensorflow import keras
-from src.utils import TEST_DIR, CLASS_NAMES, IMG_SIZE, BATCH_SIZE
+﻿import argparse
+import json
+
+import numpy as np
+
+from src.utils import TEST_DIR, VAL_DIR, CLASS_NAMES, IMG_SIZE, BATCH_SIZE
+from src.predictor import OUTPUTS_DIR, get_predictor
+
+def evaluate_production(split_dir):
+    from tensorflow import keras
 
-def main():
     test_ds = keras.utils.image_dataset_from_directory(
-        TEST_DIR,
+        split_dir,
         labels="inferred",
         label_mode="categorical",
         class_names=CLASS_NAMES,
@@ -13,11 +19,57 @@ def main():
         shuffle=False
     )
 
-    model = keras.models.load_model("models/banana_ripeness_model.keras")
-    loss, acc = model.evaluate(test_ds)
+    predictor = get_predictor()
+    print(f"Evaluating production model: {predictor.exp_id}")
+
+    # Through predict_array rather than model.evaluate: head-only and fast
+    # artifacts load as uncompiled models
+    probs, labels = [], []
+    for x, y in test_ds:
+        probs.append(predictor.predict_array(x.numpy()))
+        labels.append(y.numpy())
+    probs = np.concatenate(probs)
+    labels = np.concatenate(labels)
+
+    eps = 1e-7
+    loss = float(-(labels * np.log(probs + eps)).sum(axis=1).mean())
+    acc = float((probs.argmax(axis=1) == labels.argmax(axis=1)).mean())
 
     print(f"✅ Test Accuracy: {acc*100:.2f}%")
     print(f"✅ Test Loss: {loss:.4f}")
 
+def evaluate_all(split, split_dir):
+    from src.embedding_cache import evaluate_experiments
+
+    results = evaluate_experiments(split_dir)
+
+    for r in results:
+        if "error" in r:
+            print(f"{r['exp_id']:40s} ⚠️ {r['error']}")
+        else:
+            print(
+                f"{r['exp_id']:40s} acc {r['accuracy']*100:6.2f}%  "
+                f"loss {r['loss']:.4f}  ({r['seconds']:.2f}s)"
+            )
+
+    out_path = OUTPUTS_DIR / "evaluation" / f"{split}_all_experiments.json"
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    out_path.write_text(json.dumps(results, indent=2))
+    print(f"Saved {out_path}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--split", default="test", choices=["test", "valid"])
+    parser.add_argument("--all", action="store_true",
+                        help="Evaluate every registered experiment via cached backbone features")
+    args = parser.parse_args()
+
+    split_dir = TEST_DIR if args.split == "test" else VAL_DIR
+
+    if args.all:
+        evaluate_all(args.split, split_dir)
+    else:
+        evaluate_production(split_dir)
+
 if __name__ == "__main__":
     main()
@@ -2,6 +2,7 @@ from pathlib import Path
 from datetime import datetime
 import json
 
+from src.fast_model import save_head_model
 from src.registry_manager import update_registry
 from src.team_logger import append_team_log
 
@@ -19,8 +20,9 @@ class ExperimentManager:
         return f"EXP-{ts}-{self.member}-{self.mode}"
 
     def save_model(self, model):
-        path = self.exp_dir / "model.keras"
-        model.save(path)
+        # Only the trained head is stored per experiment; the frozen trunk
+        # goes once to models/backbones/<fingerprint>
+        path = save_head_model(model, self.exp_dir)
         self.model_path = str(path)
 
     def save_metrics(self, metrics: dict):
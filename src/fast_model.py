@@ -0,0 +1,445 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from src.journal_logger import log_event
+from src.model_parts import (
+    HEAD_FILENAME,
+    apply_head,
+    backbone_fingerprint,
+    backbone_model,
+    backbone_weights,
+    extract_head,
+    is_head_artifact,
+    load_head,
+    save_head,
+)
+from src.registry_manager import load_registry, update_model_entry
+from src.utils import IMG_SIZE
+
+BACKBONES_DIR = Path("models") / "backbones"
+FAST_DIRNAME = "fast"
+MANIFEST_FILENAME = "manifest.json"
+WEIGHTS_FILENAME = "weights.bin"
+FORMAT_VERSION = 1
+
+# Every array starts on a 64-byte boundary of weights.bin
+_ALIGN = 64
+
+
+# ===============================
+# WEIGHT FILES
+# ===============================
+#
+# A weights directory holds
+#   weights.bin    raw arrays, each 64-byte aligned, in variable order
+#   manifest.json  shape/dtype/offset of each array plus format metadata
+# Readers memory-map weights.bin and assign each variable from its slice,
+# skipping the .keras zip, config deserialisation and extra weight copies.
+# It is used for full fast-load artifacts (outputs/<exp_id>/fast) and for
+# the shared backbone of head-only artifacts (models/backbones/<fp>).
+
+def _write_weights(variables, out_dir, **meta):
+    """
+    Write `variables` into `out_dir`. The manifest is written last, so a
+    directory with a manifest is always complete.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    specs = []
+    offset = 0
+    tmp_path = out_dir / (WEIGHTS_FILENAME + ".tmp")
+    with open(tmp_path, "wb") as f:
+        for w in variables:
+            arr = np.ascontiguousarray(w.numpy())
+            pad = -offset % _ALIGN
+            f.write(b"\0" * pad)
+            offset += pad
+            f.write(arr.tobytes())
+            specs.append({
+                "path": w.path,
+                "shape": list(arr.shape),
+                "dtype": arr.dtype.str,
+                "offset": offset,
+            })
+            offset += arr.nbytes
+    os.replace(tmp_path, out_dir / WEIGHTS_FILENAME)
+
+    manifest = {
+        "format": FORMAT_VERSION,
+        **meta,
+        "img_size": list(IMG_SIZE),
+        "size_bytes": offset,
+        "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "weights": specs,
+    }
+    (out_dir / MANIFEST_FILENAME).write_text(json.dumps(manifest, indent=2))
+    return out_dir
+
+
+def _read_manifest(path):
+    path = Path(path)
+    manifest_path = path / MANIFEST_FILENAME if path.is_dir() else path
+    manifest = json.loads(manifest_path.read_text())
+    if manifest.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported fast artifact format: {manifest.get('format')}")
+    return manifest_path, manifest
+
+
+def _assign_weights(variables, manifest_path, manifest):
+    specs = manifest["weights"]
+    if len(variables) != len(specs):
+        raise ValueError(
+            f"{manifest_path} has {len(specs)} weights, the model has {len(variables)}"
+        )
+
+    blob = np.memmap(manifest_path.parent / WEIGHTS_FILENAME, dtype=np.uint8, mode="r")
+    for var, spec in zip(variables, specs):
+        shape = tuple(spec["shape"])
+        if tuple(var.shape) != shape:
+            raise ValueError(
+                f"Shape mismatch for {spec['path']}: artifact {shape}, model {tuple(var.shape)}"
+            )
+        dtype = np.dtype(spec["dtype"])
+        nbytes = int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+        var.assign(blob[spec["offset"]:spec["offset"] + nbytes].view(dtype).reshape(shape))
+
+
+# ===============================
+# FULL FAST-LOAD ARTIFACTS
+# ===============================
+
+def save_fast_model(model, out_dir):
+    """
+    Write every weight of `model` as a fast-load artifact into `out_dir`.
+    """
+    return _write_weights(
+        model.weights, out_dir,
+        builder="src.model_builder.build_model",
+        num_classes=int(model.output_shape[-1]),
+    )
+
+
+def is_fast_artifact(path):
+    path = Path(path)
+    if path.is_dir():
+        return (path / MANIFEST_FILENAME).exists()
+    return path.name == MANIFEST_FILENAME
+
+
+def load_fast_model(path):
+    """
+    Rebuild the model from build_model() (no ImageNet download) and
+    assign its weights from a read-only memory map of weights.bin.
+    `path` is the artifact directory or its manifest.
+    """
+    from src.model_builder import build_model
+
+    manifest_path, manifest = _read_manifest(path)
+    model = build_model(manifest["num_classes"], weights=None)
+    _assign_weights(model.weights, manifest_path, manifest)
+    return model
+
+
+# ===============================
+# HEAD-ONLY ARTIFACTS
+# ===============================
+#
+# The frozen MobileNetV2 trunk is byte-identical across experiments, so
+# it is stored once under models/backbones/<fingerprint> and each
+# experiment keeps only outputs/<exp_id>/head.npz (Dense weights plus the
+# fingerprint). Trunks are built once per process and shared by every
+# head assembled on them, so switching between heads on the same trunk
+# costs a tiny Dense layer instead of a full model load.
+
+_bases = {}
+_bases_lock = threading.Lock()
+_feature_fns = {}
+_feature_fns_lock = threading.Lock()
+
+
+def save_backbone(model):
+    """
+    Store the trunk of `model` under models/backbones/<fingerprint>
+    unless an identical one is already there.
+    """
+    fingerprint = backbone_fingerprint(model)
+    out_dir = BACKBONES_DIR / fingerprint
+    if not (out_dir / MANIFEST_FILENAME).exists():
+        _write_weights(backbone_weights(model), out_dir, fingerprint=fingerprint)
+    return fingerprint, out_dir
+
+
+def save_head_model(model, out_dir):
+    """
+    Write outputs/<exp_id>/head.npz for `model` (and its shared backbone).
+    """
+    fingerprint, _ = save_backbone(model)
+    path = Path(out_dir) / HEAD_FILENAME
+    path.parent.mkdir(parents=True, exist_ok=True)
+    save_head(extract_head(model), path, fingerprint)
+    return path
+
+
+def shared_backbone(fingerprint):
+    """
+    MobileNetV2 trunk with the weights of `fingerprint`, built on first use.
+    """
+    from src.model_builder import build_backbone
+
+    with _bases_lock:
+        if fingerprint not in _bases:
+            manifest_path = BACKBONES_DIR / fingerprint / MANIFEST_FILENAME
+            if not manifest_path.exists():
+                raise FileNotFoundError(f"Shared backbone {fingerprint} missing: {manifest_path}")
+            base = build_backbone(weights=None)
+            _assign_weights(base.weights, *_read_manifest(manifest_path))
+            _bases[fingerprint] = base
+        return _bases[fingerprint]
+
+
+def load_head_model(path):
+    """
+    Assemble the full model of a head-only artifact: the shared trunk for
+    its fingerprint plus a freshly built Dense head.
+    """
+    from src.model_builder import build_model
+
+    head, fingerprint = load_head(path)
+    if len(head) != 1 or head[0]["activation"] != "softmax":
+        raise ValueError(f"{path} does not hold a build_model() head")
+
+    kernel, bias = head[0]["kernel"], head[0]["bias"]
+    model = build_model(kernel.shape[1], base=shared_backbone(fingerprint))
+    dense = model.layers[-1]
+    dense.kernel.assign(kernel)
+    dense.bias.assign(bias)
+    return model
+
+
+def shared_features_fn(fingerprint, jit_compile=False):
+    """
+    Compiled raw-pixels -> pooled-features function of a shared trunk,
+    traced once per process and reused by every head on it.
+    """
+    from src.backends import compile_inference_fn
+    from src.model_builder import build_model
+
+    key = (fingerprint, jit_compile)
+    with _feature_fns_lock:
+        if key not in _feature_fns:
+            model = build_model(1, base=shared_backbone(fingerprint))
+            infer = compile_inference_fn(backbone_model(model), jit_compile=jit_compile)
+            _feature_fns[key] = lambda x: infer(np.asarray(x, dtype=np.float32)).numpy()
+        return _feature_fns[key]
+
+
+def head_inference_fn(path, jit_compile=False):
+    """
+    Probabilities for a head-only artifact: the shared compiled trunk plus
+    the head in NumPy, so a new head needs no retracing.
+    """
+    head, fingerprint = load_head(path)
+    features = shared_features_fn(fingerprint, jit_compile)
+    return lambda x: apply_head(features(x), head)
+
+
+# ===============================
+# ANY ARTIFACT
+# ===============================
+
+def load_model_artifact(path):
+    """
+    Full Keras model from a head-only artifact, a fast artifact or a
+    .keras file.
+    """
+    if is_head_artifact(path):
+        return load_head_model(path)
+    if is_fast_artifact(path):
+        return load_fast_model(path)
+
+    from tensorflow import keras
+
+    return keras.models.load_model(path)
+
+
+def artifact_bytes(path, include_shared=True):
+    """
+    Bytes on disk behind `path`; for a head-only artifact the shared
+    backbone is counted unless `include_shared` is False.
+    """
+    path = Path(path)
+    if is_head_artifact(path):
+        size = path.stat().st_size
+        if include_shared:
+            _, fingerprint = load_head(path)
+            size += (BACKBONES_DIR / fingerprint / WEIGHTS_FILENAME).stat().st_size
+        return size
+    if is_fast_artifact(path):
+        folder = path if path.is_dir() else path.parent
+        return sum(f.stat().st_size for f in folder.iterdir() if f.is_file())
+    return path.stat().st_size
+
+
+# ===============================
+# LOAD-TIME MEASUREMENT
+# ===============================
+
+def probe(path):
+    """
+    Load one artifact in this (fresh) process. TensorFlow is imported
+    before the clock starts, so only the model load itself is timed;
+    the peak RSS covers the whole process.
+    """
+    import tensorflow  # noqa: F401
+
+    import src.model_builder  # noqa: F401
+    from src.benchmark import peak_rss_mb
+
+    start = time.perf_counter()
+    model = load_model_artifact(path)
+    seconds = time.perf_counter() - start
+    return {
+        "load_seconds": round(seconds, 3),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "weights": len(model.weights),
+    }
+
+
+def _run_probe(path):
+    proc = subprocess.run(
+        [sys.executable, "-m", "src.fast_model", "--probe", str(path)],
+        capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        err = proc.stderr.strip().splitlines()
+        raise RuntimeError(f"Load probe of {path} failed: {err[-1] if err else 'no output'}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def measure_load_time(artifacts, runs=3):
+    """
+    Median cold load time, process peak RSS and own on-disk size of each
+    {name: path} artifact, each load in its own interpreter. The first
+    artifact is the baseline the others' speedups are relative to.
+    """
+    report = {}
+    for name, path in artifacts.items():
+        samples = [_run_probe(path) for _ in range(runs)]
+        report[name] = {
+            "load_seconds": round(statistics.median(s["load_seconds"] for s in samples), 3),
+            "peak_rss_mb": round(statistics.median(s["peak_rss_mb"] for s in samples), 1),
+            "size_bytes": artifact_bytes(path, include_shared=False),
+        }
+    baseline = next(iter(artifacts))
+    base = report[baseline]["load_seconds"]
+    for name in artifacts:
+        if name != baseline:
+            report[name]["speedup"] = round(base / report[name]["load_seconds"], 2)
+    report["baseline"] = baseline
+    report["runs"] = runs
+    report["measured"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return report
+
+
+def record_load_time(exp_id, report):
+    update_model_entry(exp_id, load_time=report)
+
+
+# ===============================
+# CONVERT EXISTING MODELS
+# ===============================
+
+def convert_experiment(exp_id, fmt="head", runs=3, measure=True):
+    """
+    Convert the registered model of `exp_id`:
+      "fast"  write outputs/<exp_id>/fast and record it as the "fast" export
+      "head"  write outputs/<exp_id>/head.npz plus the shared backbone and
+              point the registry entry at the head
+    The original file is left in place. Unless `measure` is False, load
+    times of the new artifact and of the full-model source it came from
+    are recorded side by side; a head converted from a head has no
+    full-model baseline and is not measured.
+    """
+    from src.model_export import record_export
+    from src.predictor import OUTPUTS_DIR, resolve_model_path
+
+    registry = load_registry()
+    source = resolve_model_path(exp_id, registry)
+    model = load_model_artifact(source)
+
+    if fmt == "fast":
+        out_path = save_fast_model(model, OUTPUTS_DIR / exp_id / FAST_DIRNAME)
+        record_export(exp_id, "fast", out_path)
+    elif fmt == "head":
+        out_path = save_head_model(model, OUTPUTS_DIR / exp_id)
+        update_model_entry(exp_id, path=str(out_path))
+        log_event(
+            event_type="REGISTRY_UPDATED",
+            title="Model converted to head-only artifact",
+            description=f"Experiment {exp_id} now loads from its head and the shared backbone.",
+            metadata={"experiment_id": exp_id, "path": str(out_path), "previous_path": str(source)},
+        )
+    else:
+        raise ValueError(f"Unknown format '{fmt}'. Choose 'fast' or 'head'")
+
+    report = None
+    if is_head_artifact(source):
+        baseline = None
+    else:
+        baseline = "fast" if is_fast_artifact(source) else "keras"
+    if measure and baseline not in (None, fmt):
+        report = measure_load_time({baseline: source, fmt: out_path}, runs)
+        record_load_time(exp_id, report)
+    return out_path, report
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--exp-id", help="Experiment to convert (default: production model)")
+    parser.add_argument("--all", action="store_true", help="Convert every registered experiment")
+    parser.add_argument("--format", default="head", choices=("head", "fast"),
+                        help="head: head.npz + shared backbone; fast: full weights-only copy")
+    parser.add_argument("--runs", type=int, default=3, help="Cold loads per artifact when measuring")
+    parser.add_argument("--no-measure", action="store_true")
+    parser.add_argument("--probe", metavar="PATH", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.probe:
+        print(json.dumps(probe(args.probe)))
+        return
+
+    registry = load_registry()
+    if args.all:
+        exp_ids = [m["exp_id"] for m in registry.get("models", [])]
+    else:
+        exp_ids = [args.exp_id or registry.get("production_model")]
+    if not exp_ids or not exp_ids[0]:
+        raise ValueError("No experiment given and no production model set")
+
+    for exp_id in exp_ids:
+        out_path, report = convert_experiment(exp_id, args.format, args.runs, not args.no_measure)
+        print(f"{exp_id}: {out_path}")
+        if report is None and not args.no_measure:
+            print("  load time not measured: no full-model source to compare against")
+        for name, r in (report or {}).items():
+            if isinstance(r, dict):
+                print(
+                    f"  {name:6s} {r['load_seconds']:.3f}s  peak {r['peak_rss_mb']} MB  "
+                    f"{r['size_bytes'] / 1e6:.3f} MB on disk"
+                    + (f"  speedup {r['speedup']}x" if "speedup" in r else "")
+                )
+
+
+if __name__ == "__main__":
+    main()
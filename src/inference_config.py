@@ -0,0 +1,95 @@
+import json
+import os
+from pathlib import Path
+
+CONFIG_PATH = Path("config/inference_config.json")
+
+# Used until `python -m src.tune` has written a config for this machine.
+DEFAULT_PROFILES = {
+    "latency": {
+        "backend": "keras",
+        "batch_size": 1,
+        "intra_op_threads": None,
+        "inter_op_threads": None,
+        "workers": 1,
+        "pin": False,
+    },
+    "throughput": {
+        "backend": "keras",
+        "batch_size": 32,
+        "intra_op_threads": None,
+        "inter_op_threads": None,
+        "workers": 1,
+        "pin": False,
+    },
+}
+
+_active = None
+
+
+def load_inference_config(path=CONFIG_PATH):
+    """
+    Tuned profiles for this machine, falling back to DEFAULT_PROFILES for
+    anything the config file does not set.
+    """
+    config = {}
+    path = Path(path)
+    if path.exists():
+        config = json.loads(path.read_text())
+
+    profiles = {}
+    for name, defaults in DEFAULT_PROFILES.items():
+        profiles[name] = {**defaults, **config.get(name, {})}
+    return profiles
+
+
+def get_profile(name="throughput", path=CONFIG_PATH):
+    profiles = load_inference_config(path)
+    if name not in profiles:
+        raise ValueError(f"Unknown profile '{name}'. Choose from {sorted(profiles)}")
+    return profiles[name]
+
+
+def apply_profile(name="throughput", path=CONFIG_PATH):
+    """
+    Make `name` the active profile and apply its thread counts. Call once
+    at startup, before the first model is loaded: TensorFlow ignores
+    thread settings after it has initialised.
+    """
+    global _active
+    profile = get_profile(name, path)
+    _active = profile
+
+    intra = profile.get("intra_op_threads")
+    inter = profile.get("inter_op_threads")
+    if intra:
+        os.environ["TF_NUM_INTRAOP_THREADS"] = str(intra)
+    if inter:
+        os.environ["TF_NUM_INTEROP_THREADS"] = str(inter)
+
+    if intra or inter:
+        import tensorflow as tf
+
+        try:
+            if intra:
+                tf.config.threading.set_intra_op_parallelism_threads(intra)
+            if inter:
+                tf.config.threading.set_inter_op_parallelism_threads(inter)
+        except RuntimeError:
+            pass  # already initialised; env vars still apply to new workers
+    return profile
+
+
+def profile_backend_options():
+    """
+    Thread options for load_backend() from the active profile (none if
+    no profile was applied).
+    """
+    if _active is None:
+        return {}
+    options = {}
+    if _active.get("intra_op_threads"):
+        options["num_threads"] = _active["intra_op_threads"]
+    if _active.get("inter_op_threads"):
+        options["inter_op_threads"] = _active["inter_op_threads"]
+    return options
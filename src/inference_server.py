@@ -0,0 +1,276 @@
+import argparse
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.backends import BACKENDS
+from src.inference_config import apply_profile
+from src.prediction_cache import content_hash, get_prediction_cache, model_cache_id
+from src.preprocessing import load_image, stack_images
+from src.predictor import get_predictor, decode_predictions
+from src.utils import CLASS_NAMES
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8008
+
+
+# ===============================
+# MICRO-BATCHING
+# ===============================
+
+class MicroBatcher:
+    """
+    Collects concurrent single-image requests into one forward pass.
+
+    A batch is closed when it reaches `max_batch_size` images or when
+    `max_wait_ms` has passed since its first image arrived, whichever
+    comes first. Each caller gets a Future for its own row.
+    """
+
+    def __init__(self, predictor, max_batch_size=16, max_wait_ms=5.0):
+        self.predictor = predictor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.batches = 0
+        self.images = 0
+        self._queue = queue.Queue()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def submit(self, image) -> Future:
+        """
+        Queue a decoded (H, W, 3) image, or raw encoded bytes when the
+        backend decodes in-graph.
+        """
+        future = Future()
+        self._queue.put((image, future))
+        return future
+
+    def _collect(self):
+        try:
+            first = self._queue.get(timeout=0.1)
+        except queue.Empty:
+            return []
+
+        items = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(items) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                items.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return items
+
+    def _predict(self, items):
+        if isinstance(items[0][0], bytes):
+            return self.predictor.predict_encoded([b for b, _ in items])
+        return self.predictor.predict_array(stack_images(img for img, _ in items))
+
+    def _predict_one_by_one(self, items):
+        for item in items:
+            try:
+                row = self._predict([item])[0]
+            except Exception as e:
+                item[1].set_exception(e)
+                continue
+            # Each retried image that succeeds is a forward pass of its own
+            self.batches += 1
+            self.images += 1
+            item[1].set_result(row)
+
+    def _loop(self):
+        while not self._stopped.is_set():
+            items = self._collect()
+            if not items:
+                continue
+
+            try:
+                probs = self._predict(items)
+            except Exception as e:
+                if len(items) > 1:
+                    # One bad upload must not fail its batch neighbours
+                    self._predict_one_by_one(items)
+                else:
+                    items[0][1].set_exception(e)
+                continue
+
+            self.batches += 1
+            self.images += len(items)
+            for (_, future), row in zip(items, probs):
+                future.set_result(row)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "images": self.images,
+            "mean_batch_size": round(self.images / self.batches, 2) if self.batches else None,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "queued": self._queue.qsize(),
+        }
+
+    def close(self):
+        self._stopped.set()
+        self._thread.join()
+
+
+# ===============================
+# HTTP LAYER
+# ===============================
+
+class InferenceHandler(BaseHTTPRequestHandler):
+    """
+    POST /predict   raw image bytes in the body -> JSON prediction
+    GET  /health    production model id
+    GET  /stats     batching and cache counters
+    """
+
+    server_version = "CVLabInference/1.0"
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok", "exp_id": self.server.predictor.exp_id})
+        elif self.path == "/stats":
+            stats = self.server.batcher.stats()
+            if self.server.cache is not None:
+                stats["cache"] = self.server.cache.stats()
+            self._send_json(200, stats)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/predict":
+            self._send_json(404, {"error": "not found"})
+            return
+
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0:
+            self._send_json(400, {"error": "empty body"})
+            return
+
+        body = self.rfile.read(length)
+        server = self.server
+
+        if server.cache is not None:
+            model_id = model_cache_id(server.predictor)
+            key = content_hash(body)
+            row = server.cache.get(model_id, key)
+            if row is not None:
+                self._send_prediction(row)
+                return
+
+        if server.predictor.accepts_encoded:
+            # Decode + resize happen inside the serving graph
+            image = body
+        else:
+            try:
+                image = load_image(body)
+            except Exception as e:
+                self._send_json(400, {"error": f"could not decode image: {e}"})
+                return
+
+        try:
+            row = server.batcher.submit(image).result(server.request_timeout)
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+            return
+
+        # Skip caching if the model was hot-reloaded while this request ran
+        if server.cache is not None and model_cache_id(server.predictor) == model_id:
+            server.cache.put(model_id, key, row)
+        self._send_prediction(row)
+
+    def _send_prediction(self, row):
+        labels, confidences = decode_predictions(row[None, :])
+        self._send_json(200, {
+            "label": str(labels[0]),
+            "confidence": float(confidences[0]),
+            "probabilities": {c: float(p) for c, p in zip(CLASS_NAMES, row)},
+            "exp_id": self.server.predictor.exp_id,
+        })
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class InferenceServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        host=DEFAULT_HOST,
+        port=DEFAULT_PORT,
+        max_batch_size=16,
+        max_wait_ms=5.0,
+        request_timeout=30.0,
+        backend="keras",
+        use_cache=True,
+        verbose=False,
+    ):
+        super().__init__((host, port), InferenceHandler)
+        self.predictor = get_predictor(backend)
+        self.cache = get_prediction_cache() if use_cache else None
+        self.batcher = MicroBatcher(self.predictor, max_batch_size, max_wait_ms)
+        self.request_timeout = request_timeout
+        self.verbose = verbose
+
+    def server_close(self):
+        super().server_close()
+        self.batcher.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--backend", default=None, choices=BACKENDS,
+                        help="Default: backend of the tuned latency profile")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Disable the content-hash prediction cache")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    profile = apply_profile("latency")
+
+    server = InferenceServer(
+        host=args.host,
+        port=args.port,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+        backend=args.backend or profile["backend"],
+        use_cache=not args.no_cache,
+        verbose=args.verbose,
+    )
+
+    # Load the model before accepting traffic
+    print(f"Production model: {server.predictor.exp_id}")
+    print(f"Serving on http://{args.host}:{args.port}  (POST /predict)")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
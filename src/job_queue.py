@@ -0,0 +1,473 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import socket
+import sqlite3
+import tarfile
+import time
+import zipfile
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from src.bulk_inference import iter_image_files
+from src.predictor import OUTPUTS_DIR
+from src.utils import BATCH_SIZE, CLASS_NAMES
+
+JOBS_DIR = OUTPUTS_DIR / "jobs"
+JOBS_DB_PATH = JOBS_DIR / "jobs.sqlite"
+
+MAX_ATTEMPTS = 3
+# Claimed items whose worker has not reported back within this many
+# seconds (e.g. it crashed) become claimable again.
+LEASE_SECONDS = 300
+# Extra tries for a claim/record that still hits a locked database after
+# SQLite's own busy_timeout.
+DB_RETRIES = 5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source TEXT NOT NULL,
+    status TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    exp_id TEXT,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    busy_seconds REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS items (
+    job_id INTEGER NOT NULL,
+    idx INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    claimed_by TEXT,
+    claimed_at REAL,
+    label TEXT,
+    confidence REAL,
+    probs TEXT,
+    error TEXT,
+    PRIMARY KEY (job_id, idx)
+);
+CREATE INDEX IF NOT EXISTS items_status ON items (status, job_id, idx);
+"""
+
+
+def connect(db_path=JOBS_DB_PATH):
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    db = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    db.row_factory = sqlite3.Row
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA busy_timeout=30000")
+    db.executescript(SCHEMA)
+    return db
+
+
+# ===============================
+# SUBMISSION
+# ===============================
+
+def _extract_archive(archive, dest):
+    dest.mkdir(parents=True, exist_ok=True)
+    if zipfile.is_zipfile(archive):
+        with zipfile.ZipFile(archive) as zf:
+            zf.extractall(dest)
+    elif tarfile.is_tarfile(archive):
+        with tarfile.open(archive) as tf:
+            tf.extractall(dest, filter="data")
+    else:
+        raise ValueError(f"Unsupported archive: {archive}")
+
+
+def _resolve_source(source, job_id):
+    """
+    Image paths for a folder, an archive (.zip / .tar*) or a text file
+    listing one path per line; a Python list of paths is used as is.
+    """
+    if isinstance(source, (list, tuple)):
+        return [str(p) for p in source]
+
+    source = Path(source)
+    if source.is_dir():
+        return list(iter_image_files(source))
+    if zipfile.is_zipfile(source) or tarfile.is_tarfile(source):
+        dest = JOBS_DIR / f"job_{job_id}"
+        _extract_archive(source, dest)
+        return list(iter_image_files(dest))
+    if source.is_file():
+        lines = source.read_text(encoding="utf-8").splitlines()
+        return [line.strip() for line in lines if line.strip()]
+    raise FileNotFoundError(f"Job source not found: {source}")
+
+
+def submit_job(source, db_path=JOBS_DB_PATH):
+    """
+    Queue every image of `source`. Returns the job id.
+
+    The source is resolved (archives extracted) outside any write
+    transaction, so a large upload never holds the database lock that
+    workers need to claim and record batches.
+    """
+    db = connect(db_path)
+    label = json.dumps(source) if isinstance(source, (list, tuple)) else str(source)
+
+    try:
+        # Reserve the id first; a job with no items is never claimed
+        job_id = db.execute(
+            "INSERT INTO jobs (source, status, total, created) VALUES (?, 'preparing', 0, ?)",
+            (label[:1000], time.time()),
+        ).lastrowid
+        try:
+            paths = _resolve_source(source, job_id)
+        except BaseException:
+            db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+            raise
+
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.executemany(
+                "INSERT INTO items (job_id, idx, path, status) VALUES (?, ?, ?, 'pending')",
+                [(job_id, i, p) for i, p in enumerate(paths)],
+            )
+            status = "queued" if paths else "done"
+            db.execute("UPDATE jobs SET total = ?, status = ? WHERE id = ?",
+                       (len(paths), status, job_id))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+    finally:
+        db.close()
+    return job_id
+
+
+# ===============================
+# WORKER
+# ===============================
+
+def _retry_locked(fn, *args, retries=DB_RETRIES):
+    """
+    Call `fn`, retrying with backoff while SQLite reports the database
+    busy or locked beyond its own busy_timeout.
+    """
+    for attempt in range(retries):
+        try:
+            return fn(*args)
+        except sqlite3.OperationalError as e:
+            transient = "locked" in str(e) or "busy" in str(e)
+            if not transient or attempt == retries - 1:
+                raise
+            time.sleep(min(2 ** attempt, 30))
+
+
+def _update_job_counts(db, job_id, now, exp_id=None, busy_seconds=0.0):
+    """
+    Refresh a job's done/failed counters and close it once nothing is open.
+    Caller holds the write transaction.
+    """
+    counts = db.execute(
+        "SELECT"
+        " SUM(status = 'done') AS done,"
+        " SUM(status = 'failed') AS failed,"
+        " SUM(status IN ('pending', 'claimed')) AS open"
+        " FROM items WHERE job_id = ?",
+        (job_id,),
+    ).fetchone()
+    db.execute(
+        "UPDATE jobs SET done = ?, failed = ?, exp_id = COALESCE(?, exp_id),"
+        " busy_seconds = busy_seconds + ?,"
+        " status = CASE WHEN ? = 0 THEN 'done' ELSE status END,"
+        " finished = CASE WHEN ? = 0 THEN ? ELSE finished END"
+        " WHERE id = ?",
+        (counts["done"], counts["failed"], exp_id, busy_seconds,
+         counts["open"], counts["open"], now, job_id),
+    )
+
+
+def claim_batch(db, worker_id, batch_size):
+    """
+    Atomically claim up to `batch_size` pending (or lease-expired) items,
+    oldest job first.
+
+    Claiming is the only place an attempt is counted, so a try whose
+    worker died (its lease expired) counts like one that reported back.
+    Items that keep killing workers are failed once MAX_ATTEMPTS are used
+    up instead of cycling forever.
+    """
+    now = time.time()
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        rows = db.execute(
+            "SELECT job_id, idx, path, status, attempts FROM items"
+            " WHERE status = 'pending' OR (status = 'claimed' AND claimed_at < ?)"
+            " ORDER BY job_id, idx LIMIT ?",
+            (now - LEASE_SECONDS, batch_size),
+        ).fetchall()
+
+        claimed, abandoned = [], []
+        for r in rows:
+            r = dict(r)
+            if r.pop("status") == "claimed" and r["attempts"] >= MAX_ATTEMPTS:
+                abandoned.append(r)
+                continue
+            r["attempts"] += 1
+            claimed.append(r)
+
+        db.executemany(
+            "UPDATE items SET status = 'claimed', claimed_by = ?, claimed_at = ?,"
+            " attempts = ? WHERE job_id = ? AND idx = ?",
+            [(worker_id, now, r["attempts"], r["job_id"], r["idx"]) for r in claimed],
+        )
+        db.executemany(
+            "UPDATE items SET status = 'failed', claimed_by = NULL,"
+            " error = 'lease expired: worker did not report back'"
+            " WHERE job_id = ? AND idx = ?",
+            [(r["job_id"], r["idx"]) for r in abandoned],
+        )
+        for job_id in {r["job_id"] for r in abandoned}:
+            _update_job_counts(db, job_id, now)
+        for job_id in {r["job_id"] for r in claimed}:
+            db.execute(
+                "UPDATE jobs SET status = 'running', started = COALESCE(started, ?)"
+                " WHERE id = ? AND status = 'queued'",
+                (now, job_id),
+            )
+        db.execute("COMMIT")
+    except BaseException:
+        db.execute("ROLLBACK")
+        raise
+    return claimed
+
+
+def _record_batch(db, worker_id, rows, probs, decode_errors, model_error, exp_id, seconds):
+    """
+    Store results, schedule retries for transient (model) failures and
+    update per-job progress in one transaction. The attempt itself was
+    already counted by claim_batch.
+
+    Only items still claimed by `worker_id` are written: if this worker
+    outlived its lease and another one re-claimed the item, that worker's
+    result wins.
+    """
+    done, retry, failed = [], [], []
+    for row, p in zip(rows, probs):
+        key = (row["job_id"], row["idx"], worker_id)
+        if key[:2] in decode_errors:
+            failed.append((decode_errors[key[:2]], *key))
+        elif model_error is not None:
+            if row["attempts"] < MAX_ATTEMPTS:
+                retry.append((model_error, *key))
+            else:
+                failed.append((model_error, *key))
+        else:
+            idx = int(p.argmax())
+            done.append((CLASS_NAMES[idx], float(p[idx]), json.dumps(p.tolist()), *key))
+
+    owned = " WHERE job_id = ? AND idx = ? AND claimed_by = ? AND status = 'claimed'"
+    now = time.time()
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        db.executemany(
+            "UPDATE items SET status = 'done', label = ?, confidence = ?, probs = ?,"
+            " error = NULL" + owned, done)
+        db.executemany(
+            "UPDATE items SET status = 'pending', error = ?,"
+            " claimed_by = NULL, claimed_at = NULL" + owned, retry)
+        db.executemany(
+            "UPDATE items SET status = 'failed', error = ?" + owned,
+            failed)
+
+        share = seconds / len(rows) if rows else 0.0
+        for job_id in {r["job_id"] for r in rows}:
+            n_rows = sum(r["job_id"] == job_id for r in rows)
+            _update_job_counts(db, job_id, now, exp_id, share * n_rows)
+        db.execute("COMMIT")
+    except BaseException:
+        db.execute("ROLLBACK")
+        raise
+
+
+def run_worker(worker_id=None, batch_size=BATCH_SIZE, backend="keras",
+               db_path=JOBS_DB_PATH, poll_interval=1.0, exit_when_idle=False):
+    """
+    Claim batches until stopped (or until the queue is empty with
+    `exit_when_idle`). The model is loaded once per worker process.
+    """
+    from src.predictor import get_predictor
+    from src.preprocessing import ParallelDecoder, stack_images
+
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    db = connect(db_path)
+    predictor = get_predictor(backend)
+    decoder = ParallelDecoder()
+
+    try:
+        while True:
+            rows = _retry_locked(claim_batch, db, worker_id, batch_size)
+            if not rows:
+                if exit_when_idle:
+                    return
+                time.sleep(poll_interval)
+                continue
+
+            start = time.perf_counter()
+            decode_errors = {}
+            images = []
+            for row, (_, img, err) in zip(rows, decoder.imap(r["path"] for r in rows)):
+                if err is not None:
+                    decode_errors[(row["job_id"], row["idx"])] = err
+                else:
+                    images.append(img)
+
+            probs = np.zeros((len(rows), len(CLASS_NAMES)), dtype=np.float32)
+            model_error = exp_id = None
+            if images:
+                try:
+                    out = iter(predictor.predict_array(stack_images(images)))
+                    exp_id = predictor.exp_id
+                    for i, row in enumerate(rows):
+                        if (row["job_id"], row["idx"]) not in decode_errors:
+                            probs[i] = next(out)
+                except Exception as e:
+                    model_error = f"{type(e).__name__}: {e}"
+
+            _retry_locked(_record_batch, db, worker_id, rows, probs, decode_errors,
+                          model_error, exp_id, time.perf_counter() - start)
+    finally:
+        db.close()
+
+
+def start_workers(workers=2, **kwargs):
+    """
+    Spawn background worker processes. Returns the Process objects.
+    """
+    ctx = mp.get_context("spawn")
+    procs = [ctx.Process(target=run_worker, kwargs=kwargs, daemon=True) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    return procs
+
+
+# ===============================
+# QUERIES
+# ===============================
+
+def job_status(job_id=None, db_path=JOBS_DB_PATH):
+    """
+    Progress of one job, or of every job when `job_id` is None.
+    """
+    db = connect(db_path)
+    try:
+        if job_id is None:
+            rows = db.execute("SELECT * FROM jobs ORDER BY id").fetchall()
+        else:
+            rows = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchall()
+    finally:
+        db.close()
+
+    jobs = []
+    for r in rows:
+        job = dict(r)
+        processed = job["done"] + job["failed"]
+        job["progress"] = round(processed / job["total"], 4) if job["total"] else 1.0
+        end = job["finished"] or time.time()
+        wall = end - job["started"] if job["started"] else None
+        job["images_per_sec"] = round(processed / wall, 2) if wall else None
+        for key in ("created", "started", "finished"):
+            if job[key] is not None:
+                job[key] = datetime.fromtimestamp(job[key]).strftime("%Y-%m-%d %H:%M:%S")
+        jobs.append(job)
+
+    if job_id is not None:
+        return jobs[0] if jobs else None
+    return jobs
+
+
+def job_results(job_id, status=None, db_path=JOBS_DB_PATH):
+    """
+    Yield result records of a job in submission order.
+    """
+    db = connect(db_path)
+    try:
+        query = "SELECT * FROM items WHERE job_id = ?"
+        params = [job_id]
+        if status:
+            query += " AND status = ?"
+            params.append(status)
+        for r in db.execute(query + " ORDER BY idx", params):
+            probs = json.loads(r["probs"]) if r["probs"] else None
+            yield {
+                "path": r["path"],
+                "status": r["status"],
+                "label": r["label"],
+                "confidence": r["confidence"],
+                "probabilities": dict(zip(CLASS_NAMES, probs)) if probs else None,
+                "attempts": r["attempts"],
+                "error": r["error"],
+            }
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("submit", help="Queue a folder, archive or path list")
+    p.add_argument("source")
+
+    p = sub.add_parser("worker", help="Run worker processes")
+    p.add_argument("--workers", type=int, default=1)
+    p.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    p.add_argument("--backend", default="keras")
+    p.add_argument("--exit-when-idle", action="store_true")
+
+    p = sub.add_parser("status", help="Show job progress")
+    p.add_argument("job_id", nargs="?", type=int)
+
+    p = sub.add_parser("results", help="Write a job's results as JSONL")
+    p.add_argument("job_id", type=int)
+    p.add_argument("--out", help="Output file (default: stdout)")
+    p.add_argument("--status", choices=["done", "failed", "pending", "claimed"])
+
+    args = parser.parse_args()
+
+    if args.command == "submit":
+        job_id = submit_job(args.source)
+        print(json.dumps(job_status(job_id), indent=2))
+
+    elif args.command == "worker":
+        options = dict(batch_size=args.batch_size, backend=args.backend,
+                       exit_when_idle=args.exit_when_idle)
+        if args.workers == 1:
+            run_worker(**options)
+        else:
+            for proc in start_workers(args.workers, **options):
+                proc.join()
+
+    elif args.command == "status":
+        print(json.dumps(job_status(args.job_id), indent=2))
+
+    elif args.command == "results":
+        out = open(args.out, "w", encoding="utf-8") if args.out else None
+        try:
+            for record in job_results(args.job_id, args.status):
+                line = json.dumps(record)
+                if out is not None:
+                    out.write(line + "\n")
+                else:
+                    print(line)
+        finally:
+            if out is not None:
+                out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+
+from src.shelf_life import BASE_DAYS, estimate_shelf_life_batch
+from src.utils import CLASS_NAMES
+
+SKETCH_BINS = 500
+
+
+# ===============================
+# QUANTILE SKETCH
+# ===============================
+
+class HistogramSketch:
+    """
+    Fixed-bin histogram over [lo, hi] used as a quantile sketch.
+
+    Memory is constant, an update is a single bincount, two sketches with
+    the same bins merge by adding counts, and quantiles are accurate to
+    one bin width ((hi - lo) / bins, 0.01 days by default).
+    """
+
+    def __init__(self, lo=0.0, hi=float(BASE_DAYS.max()), bins=SKETCH_BINS, counts=None):
+        self.lo = float(lo)
+        self.hi = float(hi)
+        self.bins = int(bins)
+        self.counts = (
+            np.zeros(self.bins, dtype=np.int64) if counts is None
+            else np.asarray(counts, dtype=np.int64)
+        )
+
+    def bin_index(self, values):
+        scaled = (np.asarray(values, dtype=np.float64) - self.lo) / (self.hi - self.lo)
+        return np.clip((scaled * self.bins).astype(np.int64), 0, self.bins - 1)
+
+    def add(self, values):
+        self.counts += np.bincount(self.bin_index(values), minlength=self.bins)
+
+    def merge(self, other):
+        if (self.lo, self.hi, self.bins) != (other.lo, other.hi, other.bins):
+            raise ValueError("Cannot merge sketches with different bins")
+        self.counts += other.counts
+        return self
+
+    @property
+    def count(self):
+        return int(self.counts.sum())
+
+    def quantile(self, q):
+        """
+        Approximate q-quantile (0..1), interpolated inside the bin.
+        """
+        total = self.count
+        if total == 0:
+            return None
+        cum = np.cumsum(self.counts)
+        target = q * total
+        idx = int(np.searchsorted(cum, target, side="left"))
+        idx = min(idx, self.bins - 1)
+        before = cum[idx - 1] if idx else 0
+        inside = self.counts[idx]
+        frac = (target - before) / inside if inside else 0.0
+        width = (self.hi - self.lo) / self.bins
+        return float(self.lo + (idx + frac) * width)
+
+    def to_dict(self):
+        nonzero = np.nonzero(self.counts)[0]
+        return {
+            "lo": self.lo,
+            "hi": self.hi,
+            "bins": self.bins,
+            "counts": {int(i): int(self.counts[i]) for i in nonzero},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        counts = np.zeros(data["bins"], dtype=np.int64)
+        for i, c in data["counts"].items():
+            counts[int(i)] = c
+        return cls(data["lo"], data["hi"], data["bins"], counts)
+
+
+def _round(value):
+    return round(value, 3) if value is not None else None
+
+
+# ===============================
+# PER-LOT STATE
+# ===============================
+
+class LotStats:
+    """
+    Running class histogram, shelf-life sum and shelf-life sketch of one lot.
+    """
+
+    def __init__(self):
+        self.class_counts = np.zeros(len(CLASS_NAMES), dtype=np.int64)
+        self.days_sum = 0.0
+        self.sketch = HistogramSketch()
+
+    @property
+    def count(self):
+        return int(self.class_counts.sum())
+
+    def merge(self, other):
+        self.class_counts += other.class_counts
+        self.days_sum += other.days_sum
+        self.sketch.merge(other.sketch)
+        return self
+
+    def summary(self, quantiles=(0.1, 0.5, 0.9)):
+        n = self.count
+        return {
+            "count": n,
+            "classes": {c: int(k) for c, k in zip(CLASS_NAMES, self.class_counts)},
+            "mean_days": round(self.days_sum / n, 3) if n else None,
+            "days_quantiles": {
+                f"p{int(q * 100)}": _round(self.sketch.quantile(q)) for q in quantiles
+            },
+        }
+
+    def to_dict(self):
+        return {
+            "class_counts": self.class_counts.tolist(),
+            "days_sum": self.days_sum,
+            "sketch": self.sketch.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.class_counts = np.asarray(data["class_counts"], dtype=np.int64)
+        stats.days_sum = float(data["days_sum"])
+        stats.sketch = HistogramSketch.from_dict(data["sketch"])
+        return stats
+
+
+# ===============================
+# AGGREGATOR
+# ===============================
+
+class LotAggregator:
+    """
+    Streaming per-lot ripeness aggregation.
+
+    Only counters and sketches are kept, never individual predictions,
+    so memory grows with the number of lots rather than bananas.
+    Aggregators built in different processes combine with merge().
+    """
+
+    def __init__(self):
+        self.lots = {}
+        # Resolved JSONL path -> bytes already aggregated (see add_file)
+        self.consumed = {}
+
+    def update(self, lot_ids, probs):
+        """
+        Add a batch of predictions: `lot_ids` (N,) and `probs` (N, num_classes).
+        """
+        probs = np.asarray(probs, dtype=np.float32)
+        if len(probs) == 0:
+            return
+        days, _ = estimate_shelf_life_batch(probs)
+        labels = probs.argmax(axis=1)
+
+        # One bincount per statistic for the whole batch, whatever the
+        # number of lots in it. Sketch bins go straight into each lot's
+        # counts, grouped by lot, rather than through an n_lots x bins array.
+        keys, inverse = np.unique(np.asarray(lot_ids, dtype=str), return_inverse=True)
+        n_lots, n_classes = len(keys), len(CLASS_NAMES)
+
+        class_counts = np.bincount(
+            inverse * n_classes + labels, minlength=n_lots * n_classes
+        ).reshape(n_lots, n_classes)
+        days_sums = np.bincount(inverse, weights=days.astype(np.float64), minlength=n_lots)
+
+        order = np.argsort(inverse, kind="stable")
+        bins = HistogramSketch().bin_index(days)[order]
+        bounds = np.concatenate(([0], np.cumsum(np.bincount(inverse, minlength=n_lots))))
+
+        for i, key in enumerate(keys.tolist()):
+            stats = self.lots.get(key)
+            if stats is None:
+                stats = self.lots[key] = LotStats()
+            stats.class_counts += class_counts[i]
+            stats.days_sum += float(days_sums[i])
+            np.add.at(stats.sketch.counts, bins[bounds[i]:bounds[i + 1]], 1)
+
+    def add_records(self, records, lot_fn, chunk_size=10_000):
+        """
+        Consume prediction records (as written by bulk inference) in
+        chunks. `lot_fn(record)` returns the lot id of a record; records
+        without probabilities (failed images) are skipped.
+        """
+        lot_ids, rows = [], []
+        for record in records:
+            probs = record.get("probabilities")
+            if not probs:
+                continue
+            if isinstance(probs, dict):
+                probs = [probs[c] for c in CLASS_NAMES]
+            lot_ids.append(lot_fn(record))
+            rows.append(probs)
+            if len(rows) == chunk_size:
+                self.update(lot_ids, rows)
+                lot_ids, rows = [], []
+        if rows:
+            self.update(lot_ids, rows)
+
+    def add_file(self, path, lot_fn, chunk_size=10_000):
+        """
+        Consume the records appended to a bulk-inference JSONL file since
+        the last call for that file, so re-running on a growing file never
+        counts a record twice. A trailing partial line is left for the next
+        call; a file that shrank (rotated) is read from the start.
+        """
+        key = str(Path(path).resolve())
+        offset = self.consumed.get(key, 0)
+        if Path(path).stat().st_size < offset:
+            offset = 0
+
+        def records(f):
+            nonlocal offset
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                if line.strip():
+                    yield json.loads(line)
+
+        with open(path, "rb") as f:
+            f.seek(offset)
+            self.add_records(records(f), lot_fn, chunk_size)
+        self.consumed[key] = offset
+
+    def merge(self, other):
+        """
+        Add another aggregator's lots. Both must have consumed disjoint
+        results files; otherwise the shared records would be counted twice.
+        """
+        overlap = set(self.consumed) & set(other.consumed)
+        if overlap:
+            raise ValueError(
+                f"Both aggregators consumed {sorted(overlap)}; merging would double count"
+            )
+        for key, stats in other.lots.items():
+            if key in self.lots:
+                self.lots[key].merge(stats)
+            else:
+                self.lots[key] = LotStats.from_dict(stats.to_dict())
+        self.consumed.update(other.consumed)
+        return self
+
+    # ---------- queries ----------
+
+    def summary(self, lot_id):
+        stats = self.lots.get(lot_id)
+        return stats.summary() if stats is not None else None
+
+    def summaries(self):
+        return {key: stats.summary() for key, stats in sorted(self.lots.items())}
+
+    def must_ship_today(self, max_days=1.0, quantile=0.5, min_count=1):
+        """
+        Lots whose `quantile` of remaining shelf life is at most `max_days`
+        (by default: half the lot has a day or less left), most urgent first.
+        """
+        urgent = []
+        for key, stats in self.lots.items():
+            if stats.count < min_count:
+                continue
+            days = stats.sketch.quantile(quantile)
+            if days is not None and days <= max_days:
+                urgent.append({"lot": key, "days": round(days, 3), "count": stats.count})
+        return sorted(urgent, key=lambda r: r["days"])
+
+    # ---------- persistence ----------
+
+    def to_dict(self):
+        return {
+            "lots": {key: stats.to_dict() for key, stats in self.lots.items()},
+            "consumed": self.consumed,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        agg = cls()
+        if set(data) == {"lots", "consumed"}:
+            agg.consumed = dict(data["consumed"])
+            data = data["lots"]
+        # Older state files hold the lots mapping only
+        agg.lots = {key: LotStats.from_dict(s) for key, s in data.items()}
+        return agg
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_dict()))
+
+    @classmethod
+    def load(cls, path):
+        return cls.from_dict(json.loads(Path(path).read_text()))
+
+
+def lot_from_parent(record):
+    """
+    Default lot id: the folder an image lives in (one folder per crate).
+    """
+    return Path(record["path"]).parent.name
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("results", nargs="+", help="Bulk inference JSONL files")
+    parser.add_argument("--lot-field",
+                        help="Record field holding the lot id (default: image folder name)")
+    parser.add_argument("--state", help="Aggregator JSON to merge into and save")
+    parser.add_argument("--max-days", type=float, default=1.0)
+    parser.add_argument("--quantile", type=float, default=0.5)
+    args = parser.parse_args()
+
+    lot_fn = (lambda r: str(r[args.lot_field])) if args.lot_field else lot_from_parent
+
+    agg = LotAggregator()
+    if args.state and Path(args.state).exists():
+        agg = LotAggregator.load(args.state)
+
+    for path in args.results:
+        agg.add_file(path, lot_fn)
+
+    if args.state:
+        agg.save(args.state)
+
+    print(json.dumps({
+        "lots": agg.summaries(),
+        "must_ship_today": agg.must_ship_today(args.max_days, args.quantile),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+from tensorflow import keras
+from tensorflow.keras import layers
+
+from src.utils import IMG_SIZE
+
+
+# ===============================
+# MODEL
+# ===============================
+
+def build_backbone(weights="imagenet"):
+    """
+    Frozen MobileNetV2 trunk (no top) shared by every experiment.
+    """
+    base = keras.applications.MobileNetV2(
+        input_shape=(IMG_SIZE[0], IMG_SIZE[1], 3),
+        include_top=False,
+        weights=weights
+    )
+    base.trainable = False
+    return base
+
+
+def build_model(num_classes: int, weights="imagenet", base=None):
+    """
+    MobileNetV2 (frozen) -> GAP -> Dropout -> Dense softmax.
+
+    `weights=None` skips the ImageNet download; used when the weights are
+    about to be overwritten anyway (fast artifact loading). An existing
+    `base` trunk is reused as-is, so several heads can share one backbone.
+    """
+    if base is None:
+        base = build_backbone(weights)
+
+    inputs = keras.Input(shape=(IMG_SIZE[0], IMG_SIZE[1], 3))
+    x = keras.applications.mobilenet_v2.preprocess_input(inputs)
+    x = base(x, training=False)
+    x = layers.GlobalAveragePooling2D()(x)
+    x = layers.Dropout(0.2)(x)
+    outputs = layers.Dense(num_classes, activation="softmax")(x)
+
+    return keras.Model(inputs, outputs)
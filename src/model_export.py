@@ -0,0 +1,209 @@
+import argparse
+import json
+from datetime import datetime
+from pathlib import Path
+
+from src.journal_logger import log_event
+from src.predictor import EXPORT_FILENAMES, OUTPUTS_DIR
+from src.registry_manager import load_registry, update_model_entry
+from src.utils import IMG_SIZE
+
+
+# ===============================
+# HELPERS
+# ===============================
+
+def _resolve_exp_id(exp_id=None):
+    registry = load_registry()
+    exp_id = exp_id or registry.get("production_model")
+    if not exp_id:
+        raise ValueError("No experiment given and no production model set")
+    return exp_id, registry
+
+
+def load_keras_model(exp_id, registry=None):
+    from src.fast_model import load_model_artifact
+    from src.predictor import resolve_artifact
+
+    return load_model_artifact(resolve_artifact(exp_id, "keras", registry))
+
+
+def record_export(exp_id, fmt, path, **details):
+    """
+    Record an export in outputs/<exp_id>/exports.json and in the
+    registry entry's "exports" map so backends can find it.
+    """
+    path = Path(path)
+    exp_dir = OUTPUTS_DIR / exp_id
+    exp_dir.mkdir(parents=True, exist_ok=True)
+
+    manifest_path = exp_dir / "exports.json"
+    manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+    manifest[fmt] = {
+        "path": str(path),
+        "size_bytes": _artifact_size(path),
+        "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        **details,
+    }
+    manifest_path.write_text(json.dumps(manifest, indent=2))
+
+    update_model_entry(exp_id, exports={fmt: str(path)})
+
+    log_event(
+        event_type="MODEL_EXPORTED",
+        title=f"Model exported ({fmt})",
+        description=f"Experiment {exp_id} exported to {fmt}.",
+        metadata={"experiment_id": exp_id, "format": fmt, "path": str(path)},
+    )
+    return manifest[fmt]
+
+
+def _artifact_size(path: Path):
+    if path.is_dir():
+        return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+    return path.stat().st_size
+
+
+# ===============================
+# TFLITE
+# ===============================
+
+def export_tflite(exp_id=None):
+    """
+    Convert a registered .keras model to outputs/<exp_id>/model.tflite.
+    """
+    import tensorflow as tf
+
+    exp_id, registry = _resolve_exp_id(exp_id)
+    model = load_keras_model(exp_id, registry)
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    tflite_model = converter.convert()
+
+    out_path = OUTPUTS_DIR / exp_id / EXPORT_FILENAMES["tflite"]
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    out_path.write_bytes(tflite_model)
+
+    return record_export(exp_id, "tflite", out_path)
+
+
+# ===============================
+# ONNX
+# ===============================
+
+def export_onnx(exp_id=None, opset=17):
+    """
+    Convert a registered .keras model to outputs/<exp_id>/model.onnx
+    (requires the optional tf2onnx package).
+    """
+    import tensorflow as tf
+    import tf2onnx
+
+    exp_id, registry = _resolve_exp_id(exp_id)
+    model = load_keras_model(exp_id, registry)
+
+    spec = tf.TensorSpec((None, IMG_SIZE[1], IMG_SIZE[0], 3), tf.float32, name="image")
+
+    @tf.function(input_signature=[spec])
+    def serve(image):
+        return {"probabilities": model(image, training=False)}
+
+    out_path = OUTPUTS_DIR / exp_id / EXPORT_FILENAMES["onnx"]
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tf2onnx.convert.from_function(
+        serve, input_signature=[spec], opset=opset, output_path=str(out_path)
+    )
+
+    return record_export(exp_id, "onnx", out_path, opset=opset)
+
+
+# ===============================
+# SERVING SAVEDMODEL
+# ===============================
+
+def build_serving_module(model):
+    """
+    Wrap a Keras model in a tf.Module whose signatures take uint8 pixels
+    or encoded image bytes. Decode and resize use the same tf.image ops
+    as image_dataset_from_directory during training, and normalisation
+    is the preprocess_input already inside the model.
+    """
+    import tensorflow as tf
+
+    height, width = IMG_SIZE[1], IMG_SIZE[0]
+
+    class ServingModule(tf.Module):
+        def __init__(self):
+            super().__init__()
+            self.model = model
+
+        @tf.function(input_signature=[
+            tf.TensorSpec((None, height, width, 3), tf.uint8, name="image")
+        ])
+        def serve_uint8(self, image):
+            x = tf.cast(image, tf.float32)
+            return {"probabilities": self.model(x, training=False)}
+
+        @tf.function(input_signature=[
+            tf.TensorSpec((None,), tf.string, name="image_bytes")
+        ])
+        def serve_encoded(self, image_bytes):
+            def decode(blob):
+                img = tf.io.decode_image(blob, channels=3, expand_animations=False)
+                img = tf.image.resize(img, (height, width))
+                img.set_shape((height, width, 3))
+                return img
+
+            x = tf.map_fn(
+                decode,
+                image_bytes,
+                fn_output_signature=tf.TensorSpec((height, width, 3), tf.float32),
+            )
+            return {"probabilities": self.model(x, training=False)}
+
+    return ServingModule()
+
+
+def export_serving(exp_id=None):
+    """
+    Export outputs/<exp_id>/serving/, a SavedModel with serve_uint8 and
+    serve_encoded signatures.
+    """
+    import tensorflow as tf
+
+    exp_id, registry = _resolve_exp_id(exp_id)
+    module = build_serving_module(load_keras_model(exp_id, registry))
+
+    out_path = OUTPUTS_DIR / exp_id / EXPORT_FILENAMES["serving"]
+    tf.saved_model.save(
+        module,
+        str(out_path),
+        signatures={
+            "serving_default": module.serve_uint8,
+            "serve_uint8": module.serve_uint8,
+            "serve_encoded": module.serve_encoded,
+        },
+    )
+
+    return record_export(exp_id, "serving", out_path)
+
+
+EXPORTERS = {
+    "tflite": export_tflite,
+    "onnx": export_onnx,
+    "serving": export_serving,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--format", required=True, choices=sorted(EXPORTERS))
+    parser.add_argument("--exp", help="Experiment ID (default: production model)")
+    args = parser.parse_args()
+
+    info = EXPORTERS[args.format](args.exp)
+    print(json.dumps(info, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+
+HEAD_FILENAME = "head.npz"
+
+
+# ===============================
+# BACKBONE / HEAD SPLIT
+# ===============================
+#
+# Every model from build_model() is
+#   input -> preprocess_input -> MobileNetV2 (frozen) -> GAP -> Dropout -> Dense
+# so everything up to the pooling layer is a shared feature extractor and
+# the layers after it are a small per-experiment head.
+
+def _pooling_index(model):
+    from tensorflow.keras import layers
+
+    for i, layer in enumerate(model.layers):
+        if isinstance(layer, layers.GlobalAveragePooling2D):
+            return i
+    raise ValueError("Model has no GlobalAveragePooling2D layer to split at")
+
+
+def backbone_model(model):
+    """
+    Sub-model from the raw 0-255 image input to the pooled features.
+    """
+    from tensorflow import keras
+
+    pool = model.layers[_pooling_index(model)]
+    return keras.Model(model.inputs, pool.output)
+
+
+def backbone_weights(model):
+    """
+    Every weight variable feeding the pooling layer, in layer order.
+    """
+    return [w for layer in model.layers[:_pooling_index(model)] for w in layer.weights]
+
+
+def backbone_fingerprint(model):
+    """
+    Content hash of every weight feeding the pooling layer. Two models
+    with the same fingerprint produce identical pooled features.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for w in backbone_weights(model):
+        h.update(np.ascontiguousarray(w.numpy()).tobytes())
+    return h.hexdigest()
+
+
+def extract_head(model):
+    """
+    Dense layers after the pooling layer as plain NumPy weights.
+    Dropout is an identity at inference time and is skipped.
+    """
+    from tensorflow.keras import layers
+
+    head = []
+    for layer in model.layers[_pooling_index(model) + 1:]:
+        if isinstance(layer, layers.Dropout):
+            continue
+        if not isinstance(layer, layers.Dense):
+            raise ValueError(f"Unsupported head layer: {layer.__class__.__name__}")
+        kernel, bias = (w.numpy() for w in layer.weights)
+        head.append({
+            "kernel": kernel.astype(np.float32),
+            "bias": bias.astype(np.float32),
+            "activation": layer.get_config()["activation"],
+        })
+    return head
+
+
+def _softmax(x):
+    x = x - x.max(axis=-1, keepdims=True)
+    e = np.exp(x)
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+_ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0),
+    "softmax": _softmax,
+}
+
+
+def apply_head(features, head):
+    """
+    Run a head on (N, D) pooled features, returning (N, num_classes).
+    """
+    x = np.asarray(features, dtype=np.float32)
+    for dense in head:
+        x = _ACTIVATIONS[dense["activation"]](x @ dense["kernel"] + dense["bias"])
+    return x
+
+
+# ===============================
+# HEAD FILES
+# ===============================
+
+def save_head(head, path, fingerprint):
+    arrays = {}
+    for i, dense in enumerate(head):
+        arrays[f"kernel_{i}"] = dense["kernel"]
+        arrays[f"bias_{i}"] = dense["bias"]
+    meta = {
+        "activations": [d["activation"] for d in head],
+        "backbone_fingerprint": fingerprint,
+    }
+    np.savez(path, meta=np.array(json.dumps(meta)), **arrays)
+
+
+def load_head(path):
+    """
+    Returns:
+        head (list of dense dicts)
+        backbone fingerprint (str)
+    """
+    with np.load(path) as data:
+        meta = json.loads(str(data["meta"]))
+        head = [
+            {
+                "kernel": data[f"kernel_{i}"],
+                "bias": data[f"bias_{i}"],
+                "activation": act,
+            }
+            for i, act in enumerate(meta["activations"])
+        ]
+    return head, meta["backbone_fingerprint"]
+
+
+def is_head_artifact(path):
+    """
+    True for head-only experiment artifacts (see src/fast_model.py).
+    """
+    return Path(path).suffix == ".npz"
+
+
+def cached_head(exp_id, model_path, outputs_dir=Path("outputs")):
+    """
+    Head weights of an experiment, extracted from its full model once and
+    kept in outputs/<exp_id>/head.npz so later calls skip the model load.
+    Head-only experiments are read directly.
+    """
+    if is_head_artifact(model_path):
+        return load_head(model_path)
+
+    path = Path(outputs_dir) / exp_id / HEAD_FILENAME
+    if path.exists() and path.stat().st_mtime >= Path(model_path).stat().st_mtime:
+        return load_head(path)
+
+    from src.fast_model import load_model_artifact
+
+    model = load_model_artifact(model_path)
+    head = extract_head(model)
+    fingerprint = backbone_fingerprint(model)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    save_head(head, path, fingerprint)
+    return head, fingerprint
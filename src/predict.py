@@ -1,27 +1,158 @@
-﻿import numpy as np
-import tensorflow as tf
-from tensorflow import keras
-from PIL import Image
-from src.utils import CLASS_NAMES, IMG_SIZE
+﻿import argparse
+import json
 
-MODEL_PATH = "models/banana_ripeness_model.keras"
+import numpy as np
+from src.utils import BATCH_SIZE, CLASS_NAMES
+from src.preprocessing import ParallelDecoder, stack_images
+from src.backends import BACKENDS
+from src.inference_config import apply_profile
+from src.predictor import get_predictor, decode_predictions
 
-def predict_image(image_path: str):
-    model = keras.models.load_model(MODEL_PATH)
+def predict_images(
+    paths_or_arrays,
+    batch_size: int = BATCH_SIZE,
+    decode_workers=None,
+    backend="keras",
+    cascade=False,
+    tta=False,
+    ensemble=0,
+):
+    """
+    Classify many images with one forward pass per batch.
+    Decoding runs on a thread pool while the model works on the
+    previous batch. With `cascade`, clear-cut images are answered by the
+    colour-histogram stage and only the rest reach the CNN. With `tta`,
+    flipped and cropped variants of every image share that forward pass
+    and their probabilities are averaged. With `ensemble` = k, the heads
+    of the top-k registry models share one backbone pass (keras only).
 
-    img = Image.open(image_path).convert("RGB")
-    img = img.resize(IMG_SIZE)
-    x = np.array(img, dtype=np.float32)
-    x = np.expand_dims(x, axis=0)
+    Returns:
+        labels (np.ndarray[str])
+        confidences (np.ndarray[float32])
+        probabilities (np.ndarray, shape (N, num_classes))
+    """
+    if ensemble:
+        from src.ensemble import get_ensemble_predictor
 
-    preds = model.predict(x, verbose=0)[0]
-    idx = int(np.argmax(preds))
-    label = CLASS_NAMES[idx]
-    confidence = float(preds[idx])
+        predictor = get_ensemble_predictor(ensemble)
+    else:
+        predictor = get_predictor(backend)
 
-    return label, confidence
+    if cascade:
+        from src.color_cascade import CascadePredictor, ColorCascade
 
-if __name__ == "__main__":
-    path = input("Enter image path: ").strip()
-    label, conf = predict_image(path)
+        predictor = CascadePredictor(predictor, ColorCascade.load())
+
+    infer = predictor.predict_array
+    if tta:
+        from src.tta import predict_tta
+
+        infer = lambda x: predict_tta(predictor.predict_array, x)
+
+    decoder = ParallelDecoder(
+        workers=decode_workers,
+        max_in_flight=max(batch_size * 2, (decode_workers or 8) * 4),
+    )
+    chunks = []
+    images = []
+
+    for source, img, err in decoder.imap(paths_or_arrays):
+        if err is not None:
+            raise ValueError(f"Could not decode {source!r}: {err}")
+        images.append(img)
+        if len(images) == batch_size:
+            chunks.append(infer(stack_images(images)))
+            images = []
+    if images:
+        chunks.append(infer(stack_images(images)))
+
+    if not chunks:
+        empty = np.empty((0, len(CLASS_NAMES)), dtype=np.float32)
+        return np.array([], dtype=str), np.array([], dtype=np.float32), empty
+
+    probs = np.concatenate(chunks)
+    labels, confidences = decode_predictions(probs)
+    return labels, confidences, probs
+
+def predict_image(image_path: str, backend="keras", cascade=False, tta=False, ensemble=0):
+    labels, confidences, _ = predict_images(
+        [image_path], batch_size=1, backend=backend, cascade=cascade, tta=tta,
+        ensemble=ensemble,
+    )
+    return str(labels[0]), float(confidences[0])
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("image", nargs="?", help="Single image to classify")
+    parser.add_argument("--input-dir", help="Folder of images to score in bulk")
+    parser.add_argument("--out", default="results.jsonl",
+                        help="Bulk output file (.jsonl or .csv); reruns resume from it")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help="Bulk batch size (default: tuned throughput profile)")
+    parser.add_argument("--backend", default=None, choices=BACKENDS,
+                        help="Default: backend of the tuned inference profile")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Bulk mode: model processes (default: tuned profile)")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="Bulk mode: score again files that failed in an earlier run")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Bulk mode: bypass the prediction cache")
+    parser.add_argument("--cascade", action="store_true",
+                        help="Answer clear-cut images with the colour pre-classifier")
+    parser.add_argument("--tta", action="store_true",
+                        help="Average flips/crops of each image in one forward pass")
+    parser.add_argument("--ensemble", type=int, default=0, metavar="K",
+                        help="Average the top-K registry models over one shared backbone pass")
+    parser.add_argument("--crate", action="store_true",
+                        help="Segment and classify every banana in the photo")
+    parser.add_argument("--decode-workers", type=int, default=None,
+                        help="Decode threads (default: min(8, CPU count))")
+    args = parser.parse_args()
+
+    # Bulk jobs use the throughput profile, single images the latency one
+    profile = apply_profile("throughput" if args.input_dir else "latency")
+    backend = args.backend or profile["backend"]
+
+    if args.input_dir:
+        from src.bulk_inference import run_bulk_inference
+
+        workers = args.workers or profile["workers"]
+        # The tuned thread split only holds for the worker count it was measured at
+        tuned = workers == profile["workers"]
+        summary = run_bulk_inference(
+            args.input_dir,
+            args.out,
+            batch_size=args.batch_size or profile["batch_size"],
+            decode_workers=args.decode_workers,
+            backend=backend,
+            use_cache=not args.no_cache,
+            cascade=args.cascade,
+            workers=workers,
+            ensemble=args.ensemble,
+            intra_op_threads=profile["intra_op_threads"] if tuned else None,
+            inter_op_threads=(profile["inter_op_threads"] if tuned else None) or 1,
+            pin=bool(profile.get("pin")) if tuned else False,
+            retry_failed=args.retry_failed,
+        )
+        print(json.dumps(summary, indent=2))
+        return
+
+    path = args.image or input("Enter image path: ").strip()
+
+    if args.crate:
+        from src.crate_inference import predict_crate
+
+        bananas = predict_crate(path, backend=backend)
+        for i, b in enumerate(bananas, 1):
+            print(f"Banana {i} {tuple(b['box'])}: {b['label']} "
+                  f"({b['confidence']*100:.2f}%), ~{b['days_left']} days left")
+        return
+
+    label, conf = predict_image(
+        path, backend=backend, cascade=args.cascade, tta=args.tta,
+        ensemble=args.ensemble,
+    )
     print(f"Prediction: {label} ({conf*100:.2f}%)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+CACHE_DB_PATH = Path("outputs/cache/predictions.sqlite")
+
+
+def content_hash(data: bytes) -> str:
+    """
+    Fast 128-bit content hash of raw image bytes.
+    """
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def model_cache_id(predictor) -> str:
+    """
+    Cache namespace for a predictor: experiment id plus backend, since
+    quantized exports can give slightly different probabilities, plus the
+    model file's mtime and size, so a model rewritten under the same
+    exp_id never sees the old one's rows.
+    """
+    stat = Path(predictor.model_path).stat()
+    return f"{predictor.exp_id}:{predictor.backend_name}:{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+
+class PredictionCache:
+    """
+    Two-tier prediction cache keyed by (model id, image content hash).
+
+    Tier 1 is a bounded in-memory LRU; tier 2 is a SQLite table shared
+    by every process on the machine. Entries for a model are never
+    served to another model, and the in-memory tier is dropped as soon
+    as the production model changes.
+    """
+
+    def __init__(self, max_entries=4096, db_path=CACHE_DB_PATH):
+        self.max_entries = max_entries
+        self.db_path = Path(db_path) if db_path else None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._model_id = None
+        self._lock = threading.Lock()
+        self._db = None
+
+        if self.db_path is not None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                " model_id TEXT NOT NULL,"
+                " hash TEXT NOT NULL,"
+                " probs BLOB NOT NULL,"
+                " PRIMARY KEY (model_id, hash))"
+            )
+            self._db.commit()
+
+    def _switch_model(self, model_id):
+        if model_id != self._model_id:
+            self._memory.clear()
+            self._model_id = model_id
+
+    def get(self, model_id, key):
+        with self._lock:
+            self._switch_model(model_id)
+
+            probs = self._memory.get(key)
+            if probs is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return probs
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT probs FROM predictions WHERE model_id = ? AND hash = ?",
+                    (model_id, key),
+                ).fetchone()
+                if row is not None:
+                    probs = np.frombuffer(row[0], dtype=np.float32)
+                    self._remember(key, probs)
+                    self.disk_hits += 1
+                    return probs
+
+            self.misses += 1
+            return None
+
+    def put_many(self, model_id, keys, probs):
+        probs = np.asarray(probs, dtype=np.float32)
+        with self._lock:
+            self._switch_model(model_id)
+            for key, row in zip(keys, probs):
+                self._remember(key, row.copy())
+
+            if self._db is not None:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO predictions (model_id, hash, probs) VALUES (?, ?, ?)",
+                    [(model_id, k, row.tobytes()) for k, row in zip(keys, probs)],
+                )
+                self._db.commit()
+
+    def put(self, model_id, key, probs):
+        self.put_many(model_id, [key], np.asarray(probs)[None, :])
+
+    def _remember(self, key, probs):
+        self._memory[key] = probs
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def invalidate(self, keep_exp_id=None):
+        """
+        Drop the memory tier and every disk entry not belonging to
+        `keep_exp_id` (all entries if None).
+        """
+        with self._lock:
+            self._memory.clear()
+            self._model_id = None
+            if self._db is not None:
+                if keep_exp_id is None:
+                    self._db.execute("DELETE FROM predictions")
+                else:
+                    # Plain prefix compare: exp ids may contain LIKE wildcards (_ %)
+                    prefix = f"{keep_exp_id}:"
+                    self._db.execute(
+                        "DELETE FROM predictions WHERE substr(model_id, 1, length(?)) != ?",
+                        (prefix, prefix),
+                    )
+                self._db.commit()
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        hits = self.memory_hits + self.disk_hits
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else None,
+            "memory_entries": len(self._memory),
+        }
+
+
+# ===============================
+# HELPERS
+# ===============================
+
+def predict_bytes(predictor, blobs, cache):
+    """
+    Probabilities for a list of encoded images. Cache hits skip decode
+    and inference; misses go through one batched predict_encoded call.
+    """
+    model_id = model_cache_id(predictor)
+    keys = [content_hash(b) for b in blobs]
+    results = [cache.get(model_id, k) for k in keys]
+
+    missing = [i for i, r in enumerate(results) if r is None]
+    if missing:
+        probs = predictor.predict_encoded([blobs[i] for i in missing])
+        # An unchanged id means no hot reload around the forward pass,
+        # so these rows really came from the model `model_id` names
+        if model_cache_id(predictor) == model_id:
+            cache.put_many(model_id, [keys[i] for i in missing], probs)
+        for i, row in zip(missing, probs):
+            results[i] = row
+
+    return np.stack(results) if results else np.empty((0, 0), np.float32)
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_prediction_cache() -> PredictionCache:
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = PredictionCache()
+        return _shared
+
+
+def purge_prediction_cache(keep_exp_id=None):
+    """
+    Remove on-disk entries of models other than `keep_exp_id`. Called
+    when the production model changes.
+    """
+    if CACHE_DB_PATH.exists():
+        get_prediction_cache().invalidate(keep_exp_id)
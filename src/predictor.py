@@ -0,0 +1,287 @@
+import json
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.backends import load_backend
+from src.fast_model import FAST_DIRNAME, MANIFEST_FILENAME
+from src.model_parts import is_head_artifact
+from src.inference_config import profile_backend_options
+from src.preprocessing import load_image, stack_images
+from src.registry_manager import REGISTRY_PATH, get_model_entry
+from src.utils import CLASS_NAMES
+
+MODELS_DIR = Path("models")
+OUTPUTS_DIR = Path("outputs")
+
+# File name of each exported artifact inside outputs/<exp_id>/
+EXPORT_FILENAMES = {
+    "tflite": "model.tflite",
+    "tflite_int8": "model_int8.tflite",
+    "onnx": "model.onnx",
+    "serving": "serving",
+}
+
+
+# ===============================
+# MODEL RESOLUTION
+# ===============================
+
+def resolve_model_path(exp_id, registry=None):
+    """
+    Find the model file for a registered experiment: a .keras model or
+    a head-only head.npz.
+
+    The registry path is tried first (it may use Windows separators),
+    then the legacy models/model_<exp_id>.keras copy.
+    """
+    entry = get_model_entry(exp_id, registry)
+
+    candidates = []
+    if entry and entry.get("path"):
+        candidates.append(Path(entry["path"].replace("\\", "/")))
+    candidates.append(MODELS_DIR / f"model_{exp_id}.keras")
+
+    for path in candidates:
+        if path.exists():
+            return path
+
+    raise FileNotFoundError(
+        f"No model file found for {exp_id}: "
+        + ", ".join(str(p) for p in candidates)
+    )
+
+
+def resolve_fast_artifact(exp_id, registry=None):
+    """
+    Manifest of the experiment's fast-load artifact, or None if it has none.
+    """
+    entry = get_model_entry(exp_id, registry) or {}
+    recorded = entry.get("exports", {}).get("fast")
+
+    candidates = []
+    if recorded:
+        candidates.append(Path(recorded.replace("\\", "/")))
+    candidates.append(OUTPUTS_DIR / exp_id / FAST_DIRNAME)
+
+    for path in candidates:
+        if (path / MANIFEST_FILENAME).exists():
+            return path / MANIFEST_FILENAME
+    return None
+
+
+def resolve_artifact(exp_id, backend="keras", registry=None):
+    """
+    Find the artifact a backend needs for a registered experiment: the
+    head-only artifact, fast artifact or .keras model, or an export
+    recorded under the entry's "exports".
+    """
+    if backend == "keras":
+        path = resolve_model_path(exp_id, registry)
+        if is_head_artifact(path):
+            return path
+        return resolve_fast_artifact(exp_id, registry) or path
+
+    if backend not in EXPORT_FILENAMES:
+        raise ValueError(f"Unknown backend '{backend}'")
+
+    entry = get_model_entry(exp_id, registry) or {}
+    recorded = entry.get("exports", {}).get(backend)
+
+    candidates = []
+    if recorded:
+        candidates.append(Path(recorded.replace("\\", "/")))
+    candidates.append(OUTPUTS_DIR / exp_id / EXPORT_FILENAMES[backend])
+
+    for path in candidates:
+        if path.exists():
+            return path
+
+    raise FileNotFoundError(
+        f"No {backend} export found for {exp_id}; export it first "
+        f"(looked in {', '.join(str(p) for p in candidates)})"
+    )
+
+
+def _file_signature(path: Path):
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+class _LoadedModel:
+    def __init__(self, exp_id, path, signature, backend):
+        self.exp_id = exp_id
+        self.path = path
+        self.signature = signature
+        self.backend = backend
+
+
+# ===============================
+# PREDICTOR
+# ===============================
+
+class Predictor:
+    """
+    Holds the production model for the lifetime of the process.
+
+    The registry and model file are re-checked at most every
+    `check_interval` seconds; a new model is loaded only when the
+    production entry or the file on disk changed, and swapped in
+    once it is fully loaded so in-flight predictions are unaffected.
+    """
+
+    def __init__(
+        self,
+        backend="keras",
+        registry_path=REGISTRY_PATH,
+        check_interval=2.0,
+        **backend_options,
+    ):
+        self.backend_name = backend
+        self.backend_options = backend_options
+        self.registry_path = Path(registry_path)
+        self.check_interval = check_interval
+        self._state = None
+        self._registry_signature = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    # ---------- loading ----------
+
+    def _current(self):
+        now = time.monotonic()
+        if self._state is None or now - self._last_check >= self.check_interval:
+            self.refresh()
+        return self._state
+
+    def refresh(self, force=False):
+        """
+        Reload the production model if it changed. Returns True on reload.
+        """
+        with self._lock:
+            self._last_check = time.monotonic()
+
+            if not self.registry_path.exists():
+                raise FileNotFoundError(f"{self.registry_path} missing")
+
+            registry_signature = _file_signature(self.registry_path)
+            state = self._state
+
+            if (
+                not force
+                and state is not None
+                and registry_signature == self._registry_signature
+                and state.path.exists()
+                and _file_signature(state.path) == state.signature
+            ):
+                return False
+
+            # The file whose signature was just checked, not the default registry
+            with open(self.registry_path) as f:
+                registry = json.load(f)
+            exp_id = registry.get("production_model")
+            if not exp_id:
+                raise RuntimeError("No production model set in registry")
+
+            path = resolve_artifact(exp_id, self.backend_name, registry)
+            signature = _file_signature(path)
+            self._registry_signature = registry_signature
+
+            if (
+                not force
+                and state is not None
+                and state.exp_id == exp_id
+                and state.path == path
+                and state.signature == signature
+            ):
+                return False
+
+            backend = load_backend(self.backend_name, path, **self.backend_options)
+            self._state = _LoadedModel(exp_id, path, signature, backend)
+            return True
+
+    @property
+    def backend(self):
+        return self._current().backend
+
+    @property
+    def model(self):
+        """
+        The underlying Keras model (keras backend only).
+        """
+        return self._current().backend.model
+
+    @property
+    def exp_id(self):
+        return self._current().exp_id
+
+    @property
+    def model_path(self):
+        return self._current().path
+
+    # ---------- inference ----------
+
+    def predict_array(self, x: np.ndarray):
+        """
+        Run one forward pass on an (N, H, W, 3) batch of raw 0-255 pixels.
+        Normalisation happens inside the model graph.
+        """
+        return self.backend.predict(x)
+
+    def predict(self, x: np.ndarray):
+        """
+        Classify a single (H, W, 3) image.
+
+        Returns:
+            label (str)
+            confidence (float)
+            probabilities (np.ndarray)
+        """
+        preds = self.predict_array(stack_images([x]))[0]
+        idx = int(np.argmax(preds))
+        return CLASS_NAMES[idx], float(preds[idx]), preds
+
+    @property
+    def accepts_encoded(self):
+        """
+        True when the backend decodes image bytes inside its own graph.
+        """
+        return hasattr(self.backend, "predict_encoded")
+
+    def predict_encoded(self, blobs):
+        """
+        Run one forward pass on a list of encoded image files (bytes).
+        """
+        backend = self.backend
+        if hasattr(backend, "predict_encoded"):
+            return backend.predict_encoded(blobs)
+        return backend.predict(stack_images(load_image(b) for b in blobs))
+
+
+def decode_predictions(probs: np.ndarray):
+    """
+    Turn an (N, num_classes) probability matrix into label and
+    confidence arrays.
+    """
+    idx = np.argmax(probs, axis=1)
+    labels = np.asarray(CLASS_NAMES)[idx]
+    confidences = probs[np.arange(len(probs)), idx]
+    return labels, confidences
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def get_predictor(backend="keras") -> Predictor:
+    """
+    Process-wide Predictor (one per backend) shared by the CLI, scripts
+    and Streamlit pages. Thread counts come from the active inference
+    profile, if one was applied at startup.
+    """
+    with _shared_lock:
+        if backend not in _shared:
+            _shared[backend] = Predictor(backend=backend, **profile_backend_options())
+        return _shared[backend]
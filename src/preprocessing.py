@@ -0,0 +1,175 @@
+import io
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from src.utils import IMG_SIZE, CLASS_NAMES
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+
+def load_image(source, size=IMG_SIZE):
+    """
+    Load one image as an (H, W, 3) uint8 array at the model input size.
+
+    Accepts a file path, encoded image bytes, a PIL image, or an array
+    that is already decoded (resized only if its shape differs from `size`).
+    """
+    if isinstance(source, np.ndarray):
+        source = _to_uint8(source)
+        if source.shape == (size[1], size[0], 3):
+            return source
+        img = Image.fromarray(source)
+    elif isinstance(source, Image.Image):
+        img = source
+    elif isinstance(source, (str, Path, bytes, bytearray)):
+        return decode_image(source, size)
+    else:
+        raise TypeError(f"Unsupported image source: {type(source).__name__}")
+
+    img = img.convert("RGB").resize(size)
+    return np.asarray(img, dtype=np.uint8)
+
+
+def _to_uint8(array):
+    """
+    uint8 copy of a decoded array. Floats in [0, 1] are scaled to 0-255;
+    other values are rounded and clipped rather than truncated.
+    """
+    if array.dtype == np.uint8:
+        return array
+    if array.dtype == np.bool_:
+        return array.astype(np.uint8) * 255
+    array = np.asarray(array, dtype=np.float32)
+    if array.size and array.max() <= 1.0 and array.min() >= 0.0:
+        array = array * 255.0
+    return np.clip(np.rint(array), 0, 255).astype(np.uint8)
+
+
+# Modes Image.reduce() accepts; anything else (P, 1, I;16, CMYK, ...)
+# is converted first
+_REDUCE_MODES = {"RGB", "RGBA", "L", "LA"}
+
+
+def decode_image(path, size=IMG_SIZE):
+    """
+    Decode an image file (or its encoded bytes) straight to the model
+    input size.
+
+    JPEGs are decoded at a reduced DCT scale via draft(), and other
+    formats are shrunk with reduce(), so full-resolution phone photos
+    never get fully materialised before the final resize.
+    """
+    if isinstance(path, (bytes, bytearray)):
+        path = io.BytesIO(path)
+
+    with Image.open(path) as img:
+        if img.format == "JPEG":
+            img.draft("RGB", size)
+
+        factor = min(img.width // size[0], img.height // size[1])
+        if factor >= 2:
+            if img.mode not in _REDUCE_MODES:
+                img = img.convert("RGB")
+            img = img.reduce(factor)
+
+        img = img.convert("RGB").resize(size)
+    return np.asarray(img, dtype=np.uint8)
+
+
+def list_labelled_images(split_dir, class_names=CLASS_NAMES):
+    """
+    List images of a train/valid/test split laid out as <split>/<class>/*.
+
+    Returns:
+        paths (list[str])
+        labels (np.ndarray[int]) indices into class_names
+    """
+    paths, labels = [], []
+    for idx, cls in enumerate(class_names):
+        class_dir = Path(split_dir) / cls
+        if not class_dir.is_dir():
+            continue
+        for f in sorted(class_dir.iterdir()):
+            if f.suffix.lower() in IMAGE_EXTENSIONS:
+                paths.append(str(f))
+                labels.append(idx)
+    return paths, np.asarray(labels, dtype=np.int64)
+
+
+def stack_images(images, size=IMG_SIZE, dtype=np.uint8):
+    """
+    Stack decoded images into one contiguous (N, H, W, 3) batch.
+
+    Raw 0-255 values are kept as uint8 (a quarter of the float32 size);
+    each backend casts at its own boundary and normalisation is part of
+    the model graph. Float inputs are scaled/rounded, not truncated.
+    """
+    images = list(images)
+    batch = np.empty((len(images), size[1], size[0], 3), dtype=dtype)
+    for i, img in enumerate(images):
+        batch[i] = _to_uint8(np.asarray(img)) if dtype == np.uint8 else img
+    return batch
+
+
+# ===============================
+# PARALLEL DECODE
+# ===============================
+
+class ParallelDecoder:
+    """
+    Decodes images (paths, PIL images or arrays) on a thread pool (PIL releases the GIL while
+    decoding and resizing) and yields them in input order.
+
+    At most `max_in_flight` files are pending at once, so a long path
+    iterator never turns into a large backlog of decoded arrays.
+    """
+
+    def __init__(self, workers=None, size=IMG_SIZE, max_in_flight=None, decode_fn=None):
+        self.workers = workers or min(8, os.cpu_count() or 1)
+        self.size = size
+        self.decode_fn = decode_fn or (lambda source: load_image(source, size))
+        self.max_in_flight = max_in_flight or self.workers * 4
+        self.images = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def _decode(self, source):
+        start = time.perf_counter()
+        try:
+            return source, self.decode_fn(source), None
+        except Exception as e:
+            return source, None, f"{type(e).__name__}: {e}"
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.images += 1
+                self.busy_seconds += elapsed
+
+    def imap(self, sources):
+        """
+        Yield (source, image, error) for every source, in order.
+        """
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            pending = deque()
+            for source in sources:
+                pending.append(pool.submit(self._decode, source))
+                if len(pending) >= self.max_in_flight:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    @property
+    def images_per_sec(self):
+        """
+        Decode capacity of the whole pool, from per-image busy time.
+        """
+        if not self.busy_seconds:
+            return None
+        return self.images * self.workers / self.busy_seconds
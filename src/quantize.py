@@ -0,0 +1,199 @@
+import argparse
+import json
+import time
+from datetime import datetime
+
+import numpy as np
+
+from src.backends import TFLiteBackend
+from src.benchmark import summarize_latencies, time_calls
+from src.journal_logger import log_event
+from src.model_export import export_tflite, load_keras_model, record_export
+from src.predictor import EXPORT_FILENAMES, OUTPUTS_DIR
+from src.preprocessing import list_labelled_images, load_image, stack_images
+from src.registry_manager import load_registry, update_model_entry
+from src.utils import VAL_DIR, SEED
+
+
+# ===============================
+# DATA
+# ===============================
+
+def split_validation_sample(num_calibration=200, num_eval=None, seed=SEED):
+    """
+    Shuffle the validation split once and cut it into a calibration
+    sample and a disjoint evaluation sample (the rest, by default).
+    """
+    paths, labels = list_labelled_images(VAL_DIR)
+    if not paths:
+        raise FileNotFoundError(f"No validation images found in {VAL_DIR}")
+
+    order = np.random.default_rng(seed).permutation(len(paths))
+    calib = order[:num_calibration]
+    evaluation = order[num_calibration:]
+    if num_eval is not None:
+        evaluation = evaluation[:num_eval]
+    if len(evaluation) == 0:
+        # Tiny splits: evaluate on everything rather than nothing
+        evaluation = order
+
+    def pick(idx):
+        return [paths[i] for i in idx], labels[idx]
+
+    return pick(calib), pick(evaluation)
+
+
+def representative_dataset(paths):
+    def gen():
+        for path in paths:
+            yield [stack_images([load_image(path)], dtype=np.float32)]
+    return gen
+
+
+# ===============================
+# CONVERSION
+# ===============================
+
+def convert_int8(model, calibration_paths):
+    """
+    Full-integer post-training quantization. Weights and activations
+    are int8; the model keeps float32 input/output so it is a drop-in
+    replacement for the float backends.
+    """
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset(calibration_paths)
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    return converter.convert()
+
+
+# ===============================
+# EVALUATION
+# ===============================
+
+def _accuracy(backend, paths, labels, batch_size=32):
+    correct = 0
+    for start in range(0, len(paths), batch_size):
+        x = stack_images(load_image(p) for p in paths[start:start + batch_size])
+        probs = backend.predict(x)
+        correct += int((np.argmax(probs, axis=1) == labels[start:start + batch_size]).sum())
+    return correct / len(paths)
+
+
+def _single_image_latency(backend, x, runs=50, warmup=5):
+    return summarize_latencies(time_calls(backend.predict, x, runs, warmup), 1)
+
+
+def compare_models(float_backend, int8_backend, paths, labels, float_size, int8_size):
+    x = stack_images([load_image(paths[0])])
+
+    float_acc = _accuracy(float_backend, paths, labels)
+    int8_acc = _accuracy(int8_backend, paths, labels)
+    float_lat = _single_image_latency(float_backend, x)
+    int8_lat = _single_image_latency(int8_backend, x)
+
+    return {
+        "eval_images": len(paths),
+        "float": {
+            "accuracy": round(float_acc, 4),
+            "size_bytes": float_size,
+            **float_lat,
+        },
+        "int8": {
+            "accuracy": round(int8_acc, 4),
+            "size_bytes": int8_size,
+            **int8_lat,
+        },
+        "accuracy_delta": round(int8_acc - float_acc, 4),
+        "size_ratio": round(float_size / int8_size, 2),
+        "latency_speedup": round(
+            float_lat["latency_p50_ms"] / int8_lat["latency_p50_ms"], 2
+        ),
+    }
+
+
+# ===============================
+# PIPELINE
+# ===============================
+
+def quantize_experiment(exp_id=None, num_calibration=200, num_eval=None):
+    """
+    Calibrate on a validation sample, write outputs/<exp_id>/model_int8.tflite
+    and record an accuracy / latency / size report against the float
+    TFLite export of the same model (exported first if missing), so both
+    sides run in the same runtime and are sized as the same format.
+    """
+    registry = load_registry()
+    exp_id = exp_id or registry.get("production_model")
+    if not exp_id:
+        raise ValueError("No experiment given and no production model set")
+
+    (calib_paths, _), (eval_paths, eval_labels) = split_validation_sample(
+        num_calibration, num_eval
+    )
+
+    model = load_keras_model(exp_id, registry)
+
+    start = time.perf_counter()
+    tflite_model = convert_int8(model, calib_paths)
+    convert_s = time.perf_counter() - start
+
+    out_path = OUTPUTS_DIR / exp_id / EXPORT_FILENAMES["tflite_int8"]
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    out_path.write_bytes(tflite_model)
+
+    float_path = OUTPUTS_DIR / exp_id / EXPORT_FILENAMES["tflite"]
+    if not float_path.exists():
+        export_tflite(exp_id)
+    report = compare_models(
+        TFLiteBackend(float_path),
+        TFLiteBackend(out_path),
+        eval_paths,
+        eval_labels,
+        float_size=float_path.stat().st_size,
+        int8_size=out_path.stat().st_size,
+    )
+    report.update({
+        "baseline": "tflite",
+        "calibration_images": len(calib_paths),
+        "convert_seconds": round(convert_s, 2),
+        "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    })
+
+    record_export(exp_id, "tflite_int8", out_path)
+    (OUTPUTS_DIR / exp_id / "quantization_report.json").write_text(
+        json.dumps(report, indent=2)
+    )
+    update_model_entry(exp_id, quantization=report)
+
+    log_event(
+        event_type="MODEL_QUANTIZED",
+        title="Model quantized (int8)",
+        description=f"Post-training int8 quantization of {exp_id}.",
+        metadata={
+            "experiment_id": exp_id,
+            "accuracy_delta": report["accuracy_delta"],
+            "size_ratio": report["size_ratio"],
+            "latency_speedup": report["latency_speedup"],
+        },
+    )
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--exp", help="Experiment ID (default: production model)")
+    parser.add_argument("--calibration", type=int, default=200,
+                        help="Validation images used for calibration")
+    parser.add_argument("--eval", type=int, default=None,
+                        help="Held-out validation images used for the report")
+    args = parser.parse_args()
+
+    report = quantize_experiment(args.exp, args.calibration, args.eval)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
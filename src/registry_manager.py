@@ -1,6 +1,7 @@
 import json
 from pathlib import Path
 from src.journal_logger import log_event
+from src.prediction_cache import purge_prediction_cache
 
 
 REGISTRY_PATH = Path("registry/model_registry.json")
@@ -86,6 +87,9 @@ def set_production_model(exp_id):
 
     registry["production_model"] = exp_id
 
+    # Cached predictions of the previous model must not be served
+    purge_prediction_cache(keep_exp_id=exp_id)
+
     log_event(
         event_type="PRODUCTION_SET",
         title="Production model set",
@@ -114,3 +118,36 @@ def unlock_production():
     registry = load_registry()
     registry["production_locked"] = False
     save_registry(registry)
+
+
+# -------------------------------
+# LOOKUP HELPERS
+# -------------------------------
+
+def get_model_entry(exp_id, registry=None):
+    registry = registry or load_registry()
+    return next(
+        (m for m in registry.get("models", []) if m["exp_id"] == exp_id),
+        None
+    )
+
+
+def update_model_entry(exp_id, **fields):
+    """
+    Merge extra fields (exports, benchmark reports, ...) into a model entry.
+    Nested dicts are merged one level deep.
+    """
+    registry = load_registry()
+    entry = get_model_entry(exp_id, registry)
+
+    if entry is None:
+        raise ValueError(f"Experiment {exp_id} not found in registry")
+
+    for key, value in fields.items():
+        if isinstance(value, dict) and isinstance(entry.get(key), dict):
+            entry[key].update(value)
+        else:
+            entry[key] = value
+
+    save_registry(registry)
+    return entry
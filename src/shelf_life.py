@@ -1,3 +1,27 @@
+import numpy as np
+
+from src.utils import CLASS_NAMES
+
+# Remaining days at full confidence, in CLASS_NAMES order
+# (unripe, ripe, overripe, rotten).
+BASE_DAYS = np.array([5.0, 2.0, 1.0, 0.0], dtype=np.float32)
+
+# Advice code i is the advice for ripeness stage CLASS_NAMES[i].
+ADVICE = (
+    "Store at room temperature. Do not refrigerate.",
+    "Consume soon or refrigerate to slow ripening.",
+    "Use immediately for smoothies or baking.",
+    "Discard. Not safe for consumption.",
+)
+ROTTEN_CODE = CLASS_NAMES.index("rotten")
+
+# Expected-days boundaries between stages, halfway between BASE_DAYS.
+_SORTED_DAYS = np.sort(BASE_DAYS)
+_STAGE_EDGES = (_SORTED_DAYS[:-1] + _SORTED_DAYS[1:]) / 2
+# np.digitize bucket (0 = fewest days) -> advice code
+_BUCKET_TO_CODE = np.argsort(BASE_DAYS).astype(np.uint8)
+
+
 def estimate_shelf_life(label: str, confidence: float):
     """
     Estimate remaining shelf life (in days) based on
@@ -10,31 +34,52 @@ def estimate_shelf_life(label: str, confidence: float):
 
     label = label.lower()
 
-    base_rules = {
-        "unripe": {
-            "days": 5,
-            "advice": "Store at room temperature. Do not refrigerate."
-        },
-        "ripe": {
-            "days": 2,
-            "advice": "Consume soon or refrigerate to slow ripening."
-        },
-        "overripe": {
-            "days": 1,
-            "advice": "Use immediately for smoothies or baking."
-        },
-        "rotten": {
-            "days": 0,
-            "advice": "Discard. Not safe for consumption."
-        }
-    }
-
-    if label not in base_rules:
+    if label not in CLASS_NAMES:
         return 0, "Unknown ripeness stage."
 
-    base_days = base_rules[label]["days"]
+    idx = CLASS_NAMES.index(label)
 
     # Conservative adjustment
-    adjusted_days = round(base_days * confidence, 2)
+    adjusted_days = round(float(BASE_DAYS[idx]) * confidence, 2)
+
+    return adjusted_days, ADVICE[idx]
+
+
+def estimate_shelf_life_batch(probs, rotten_threshold=0.5, chunk_size=1_000_000):
+    """
+    Vectorised shelf life for an (N, num_classes) probability matrix.
 
-    return adjusted_days, base_rules[label]["advice"]
+    Days are the expectation of BASE_DAYS under each row's distribution.
+    The advice code is the stage whose base days are closest to that
+    expectation, except that any row with P(rotten) >= rotten_threshold
+    is told to discard. Rows are processed in chunks so memmapped inputs
+    with millions of rows never get copied whole.
+
+    Returns:
+        days_left (np.ndarray[float32], shape (N,))
+        advice_codes (np.ndarray[uint8], shape (N,)) indices into ADVICE
+    """
+    probs = np.asarray(probs)
+    if probs.ndim != 2 or probs.shape[1] != len(BASE_DAYS):
+        raise ValueError(f"Expected (N, {len(BASE_DAYS)}) probabilities, got {probs.shape}")
+
+    n = len(probs)
+    days = np.empty(n, dtype=np.float32)
+    codes = np.empty(n, dtype=np.uint8)
+
+    for start in range(0, n, chunk_size):
+        chunk = np.asarray(probs[start:start + chunk_size], dtype=np.float32)
+        d = chunk @ BASE_DAYS
+        c = _BUCKET_TO_CODE[np.digitize(d, _STAGE_EDGES)]
+        c[chunk[:, ROTTEN_CODE] >= rotten_threshold] = ROTTEN_CODE
+        days[start:start + len(chunk)] = d
+        codes[start:start + len(chunk)] = c
+
+    return days, codes
+
+
+def advice_text(codes):
+    """
+    Advice strings for an array of advice codes.
+    """
+    return np.asarray(ADVICE)[np.asarray(codes)]
@@ -0,0 +1,384 @@
+import argparse
+import json
+import multiprocessing as mp
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from src.preprocessing import load_image
+from src.utils import IMG_SIZE
+
+FREE, WRITING, READY = 0, 1, 2
+
+_STOP = None
+# Waits re-check producer liveness this often
+POLL_SECONDS = 0.5
+# A slot whose token was taken but which is still not READY after this
+# long (without an explicit timeout) means its producer died mid-write
+STALL_SECONDS = 60.0
+
+
+# ===============================
+# RING BUFFER
+# ===============================
+
+class ShmImageRing:
+    """
+    Fixed ring of uint8 image slots in one shared-memory block.
+
+    Producers (any process) claim the next slot in ring order, write an
+    image straight into it and commit it with an integer tag. The
+    consumer takes runs of consecutive ready slots as a single
+    (B, H, W, 3) NumPy view of the shared block, so a batch reaches the
+    model without being pickled or copied, and releases them afterwards.
+
+    Slots are always released in ring order, so a slot a producer claims
+    is guaranteed to be free. Only slot indices cross process boundaries,
+    through semaphores.
+    """
+
+    def __init__(self, slots, image_shape, shm, owner, sync):
+        self.slots = slots
+        self.image_shape = tuple(image_shape)
+        self._shm = shm
+        self._owner = owner
+        self._free, self._filled, self._head = sync
+        self._tail = 0
+        self._pending = 0
+
+        image_bytes = slots * int(np.prod(self.image_shape))
+        self.images = np.ndarray((slots, *self.image_shape), dtype=np.uint8, buffer=shm.buf)
+        self.states = np.ndarray((slots,), dtype=np.uint8, buffer=shm.buf, offset=image_bytes)
+        tag_offset = image_bytes + _align(slots)
+        self.tags = np.ndarray((slots,), dtype=np.int64, buffer=shm.buf, offset=tag_offset)
+
+    @classmethod
+    def create(cls, slots=64, image_shape=(IMG_SIZE[1], IMG_SIZE[0], 3), ctx=None):
+        ctx = ctx or mp.get_context("spawn")
+        size = slots * int(np.prod(image_shape)) + _align(slots) + slots * 8
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        sync = (ctx.Semaphore(slots), ctx.Semaphore(0), ctx.Value("q", 0))
+        ring = cls(slots, image_shape, shm, True, sync)
+        ring.states[:] = FREE
+        return ring
+
+    def handle(self):
+        """
+        Picklable description passed to producer processes (at start-up,
+        as a Process argument).
+        """
+        return (self._shm.name, self.slots, self.image_shape,
+                (self._free, self._filled, self._head))
+
+    @classmethod
+    def attach(cls, handle):
+        name, slots, image_shape, sync = handle
+        return cls(slots, image_shape, shared_memory.SharedMemory(name=name), False, sync)
+
+    # ---------- producer side ----------
+
+    def claim(self, timeout=None):
+        """
+        Reserve the next slot. Returns (slot index, writable view) or
+        None on timeout.
+        """
+        if not self._free.acquire(timeout=timeout):
+            return None
+        with self._head.get_lock():
+            index = self._head.value % self.slots
+            self._head.value += 1
+        self.states[index] = WRITING
+        return index, self.images[index]
+
+    def commit(self, index, tag):
+        self.tags[index] = tag
+        self.states[index] = READY
+        self._filled.release()
+
+    def put(self, image, tag, timeout=None):
+        claimed = self.claim(timeout)
+        if claimed is None:
+            return False
+        index, view = claimed
+        view[...] = image
+        self.commit(index, tag)
+        return True
+
+    # ---------- consumer side ----------
+
+    def read_batch(self, max_items, timeout=None, alive=None):
+        """
+        Wait for up to `max_items` consecutive ready slots (never
+        wrapping past the end of the ring).
+
+        Returns (images view, tags copy) or None on timeout. The view
+        stays valid until release() is called. `alive()`, when given, is
+        polled while waiting and should report whether the producers are
+        still running; a RuntimeError is raised once it returns False.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        if not self._acquire(deadline, alive):
+            return None
+        start = self._tail % self.slots
+        limit = min(max_items, self.slots - start)
+        count = 1
+        while count < limit and self._filled.acquire(block=False):
+            count += 1
+
+        # Every acquired token is a committed slot; the slots at the tail
+        # are either among them or still being written by a producer
+        # that already claimed them.
+        stall = deadline or time.monotonic() + STALL_SECONDS
+        spins = 0
+        while not (self.states[start:start + count] == READY).all():
+            spins += 1
+            if spins % 1000 == 0:
+                if alive is not None and not alive():
+                    self._give_back(count)
+                    raise RuntimeError("Ring producer exited before committing its slot")
+                if time.monotonic() > stall:
+                    self._give_back(count)
+                    raise TimeoutError(f"Ring slot {start} was claimed but never committed")
+            time.sleep(0)
+
+        self._pending = count
+        return self.images[start:start + count], self.tags[start:start + count].copy()
+
+    def _acquire(self, deadline, alive):
+        if alive is None:
+            wait = None if deadline is None else max(deadline - time.monotonic(), 0)
+            return self._filled.acquire(timeout=wait)
+        while True:
+            wait = POLL_SECONDS
+            if deadline is not None:
+                wait = max(min(wait, deadline - time.monotonic()), 0)
+            if self._filled.acquire(timeout=wait):
+                return True
+            if not alive():
+                raise RuntimeError("Ring producers exited")
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+
+    def _give_back(self, count):
+        for _ in range(count):
+            self._filled.release()
+
+    def release(self):
+        """
+        Hand the slots of the last batch back to the producers.
+        """
+        count = self._pending
+        start = self._tail % self.slots
+        self.states[start:start + count] = FREE
+        self._tail += count
+        self._pending = 0
+        for _ in range(count):
+            self._free.release()
+
+    # ---------- lifetime ----------
+
+    def close(self):
+        # Views must go before the buffer can be released
+        del self.images, self.states, self.tags
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+
+def _align(n, to=8):
+    return (n + to - 1) // to * to
+
+
+# ===============================
+# PROCESS DECODER
+# ===============================
+
+def _decode_worker(handle, jobs):
+    ring = ShmImageRing.attach(handle)
+    try:
+        while True:
+            job = jobs.get()
+            if job is _STOP:
+                return
+            tag, source = job
+            index, view = ring.claim()
+            try:
+                view[...] = load_image(source)
+            except Exception:
+                view[...] = 0
+                tag = -tag - 1  # negative tag marks a failed decode
+            ring.commit(index, tag)
+    finally:
+        ring.close()
+
+
+class ProcessDecoder:
+    """
+    Decode processes writing straight into a ShmImageRing. batches()
+    yields (tags, images view) runs; failed decodes carry tag -(i + 1).
+    """
+
+    def __init__(self, workers=2, slots=128):
+        ctx = mp.get_context("spawn")
+        self.ring = ShmImageRing.create(slots, ctx=ctx)
+        self._jobs = ctx.Queue()
+        self._procs = [
+            ctx.Process(target=_decode_worker, args=(self.ring.handle(), self._jobs), daemon=True)
+            for _ in range(workers)
+        ]
+        for p in self._procs:
+            p.start()
+
+    def batches(self, sources, batch_size=32):
+        """
+        Yield (tags, images) for `sources`, where tag i is the index of
+        the source. Images are views into shared memory that are only
+        valid until the next iteration.
+        """
+        # Never queue more sources than the ring has slots: the rest of
+        # `sources` is only read as batches are consumed.
+        sources = iter(sources)
+        end = object()
+        submitted = done = 0
+        exhausted = False
+        while True:
+            while not exhausted and submitted - done < self.ring.slots:
+                source = next(sources, end)
+                if source is end:
+                    exhausted = True
+                    break
+                self._jobs.put((submitted, source))
+                submitted += 1
+            if done == submitted:
+                return
+
+            images, tags = self.ring.read_batch(
+                min(batch_size, submitted - done), alive=self._workers_alive
+            )
+            try:
+                yield tags, images
+            finally:
+                self.ring.release()
+            done += len(tags)
+
+    def _workers_alive(self):
+        return all(p.is_alive() for p in self._procs)
+
+    def close(self):
+        for _ in self._procs:
+            self._jobs.put(_STOP)
+        for p in self._procs:
+            p.join(timeout=10)
+            if p.is_alive():
+                p.terminate()
+        self.ring.close()
+
+
+# ===============================
+# BENCHMARK: RING VS QUEUE
+# ===============================
+
+def _synthetic_image(seed):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 256, size=(IMG_SIZE[1], IMG_SIZE[0], 3), dtype=np.uint8)
+
+
+def _queue_producer(q, count, seed, dtype):
+    image = _synthetic_image(seed)
+    payload = image.astype(dtype)
+    for i in range(count):
+        q.put((i, payload))
+    q.put(_STOP)
+
+
+def _ring_producer(handle, count, seed):
+    ring = ShmImageRing.attach(handle)
+    image = _synthetic_image(seed)
+    for i in range(count):
+        ring.put(image, i)
+    ring.close()
+
+
+def _bench_queue(images, producers, batch_size, dtype):
+    ctx = mp.get_context("spawn")
+    q = ctx.Queue(maxsize=batch_size * 4)
+    per = images // producers
+    procs = [ctx.Process(target=_queue_producer, args=(q, per, s, dtype)) for s in range(producers)]
+
+    for p in procs:
+        p.start()
+    stopped = received = 0
+    batch = []
+    start = None
+    while stopped < producers:
+        item = q.get()
+        start = start or time.perf_counter()  # exclude process start-up
+        if item is _STOP:
+            stopped += 1
+            continue
+        batch.append(item[1])
+        received += 1
+        if len(batch) == batch_size:
+            np.stack(batch).sum()
+            batch = []
+    if batch:
+        np.stack(batch).sum()
+    elapsed = time.perf_counter() - start
+    for p in procs:
+        p.join()
+    return received / elapsed
+
+
+def _bench_ring(images, producers, batch_size, slots):
+    ctx = mp.get_context("spawn")
+    ring = ShmImageRing.create(slots, ctx=ctx)
+    per = images // producers
+    procs = [ctx.Process(target=_ring_producer, args=(ring.handle(), per, s)) for s in range(producers)]
+
+    for p in procs:
+        p.start()
+    received = 0
+    start = None
+    while received < per * producers:
+        batch, tags = ring.read_batch(batch_size)
+        start = start or time.perf_counter()  # exclude process start-up
+        batch.sum()
+        received += len(tags)
+        ring.release()
+    elapsed = time.perf_counter() - start
+    for p in procs:
+        p.join()
+    ring.close()
+    return received / elapsed
+
+
+def benchmark(images=2000, producers=2, batch_size=32, slots=128):
+    """
+    Images/sec moved from producer processes into consumer batches by a
+    multiprocessing.Queue (float32 and uint8 payloads) and by the ring.
+    """
+    return {
+        "images": images,
+        "producers": producers,
+        "batch_size": batch_size,
+        "image_shape": [IMG_SIZE[1], IMG_SIZE[0], 3],
+        "queue_float32_images_per_sec": round(_bench_queue(images, producers, batch_size, np.float32), 1),
+        "queue_uint8_images_per_sec": round(_bench_queue(images, producers, batch_size, np.uint8), 1),
+        "shm_ring_images_per_sec": round(_bench_ring(images, producers, batch_size, slots), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=2000)
+    parser.add_argument("--producers", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--slots", type=int, default=128)
+    args = parser.parse_args()
+
+    print(json.dumps(benchmark(args.images, args.producers, args.batch_size, args.slots), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,6 @@ from pathlib import Path
 from src.journal_logger import log_event
 import tensorflow as tf
 from tensorflow import keras
-from tensorflow.keras import layers
 import matplotlib.pyplot as plt
 from src.git_auto import auto_git_commit_for_latest_event
 
@@ -20,6 +19,7 @@ from src.utils import (
 )
 
 from src.experiment_manager import ExperimentManager
+from src.model_builder import build_model
 
 
 # ===============================
@@ -36,28 +36,6 @@ def load_member_config():
         return json.load(f)
 
 
-# ===============================
-# MODEL
-# ===============================
-
-def build_model(num_classes: int):
-    base = keras.applications.MobileNetV2(
-        input_shape=(IMG_SIZE[0], IMG_SIZE[1], 3),
-        include_top=False,
-        weights="imagenet"
-    )
-    base.trainable = False
-
-    inputs = keras.Input(shape=(IMG_SIZE[0], IMG_SIZE[1], 3))
-    x = keras.applications.mobilenet_v2.preprocess_input(inputs)
-    x = base(x, training=False)
-    x = layers.GlobalAveragePooling2D()(x)
-    x = layers.Dropout(0.2)(x)
-    outputs = layers.Dense(num_classes, activation="softmax")(x)
-
-    return keras.Model(inputs, outputs)
-
-
 # ===============================
 # DATASET HELPERS
 # ===============================
@@ -0,0 +1,49 @@
+import numpy as np
+
+# Each variant is (crop fraction, horizontal flip). Crops are centred and
+# resized back to the input size, so every variant keeps the model shape.
+TTA_VARIANTS = (
+    (1.0, False),
+    (1.0, True),
+    (0.875, False),
+    (0.875, True),
+)
+
+
+def _crop_indices(length, fraction):
+    """
+    Nearest-neighbour source indices for a centred crop of `fraction`
+    of `length` pixels, resized back to `length`.
+    """
+    size = length * fraction
+    start = (length - size) / 2
+    return np.minimum((start + (np.arange(length) + 0.5) * size / length).astype(np.int64), length - 1)
+
+
+def tta_batch(x, variants=TTA_VARIANTS):
+    """
+    (N, H, W, 3) batch -> (N * K, H, W, 3) batch with the K variants of
+    each image next to each other, built with index arrays only.
+    """
+    x = np.asarray(x)
+    n, height, width = x.shape[:3]
+    out = np.empty((n, len(variants), *x.shape[1:]), dtype=x.dtype)
+
+    for k, (fraction, flip) in enumerate(variants):
+        rows = _crop_indices(height, fraction)
+        cols = _crop_indices(width, fraction)
+        if flip:
+            cols = cols[::-1]
+        out[:, k] = x[:, rows[:, None], cols[None, :]]
+
+    return out.reshape(n * len(variants), *x.shape[1:])
+
+
+def predict_tta(predict_fn, x, variants=TTA_VARIANTS):
+    """
+    Mean probabilities over all variants, using one `predict_fn` call
+    for the whole (N * K) stack.
+    """
+    n = len(x)
+    probs = predict_fn(tta_batch(x, variants))
+    return probs.reshape(n, len(variants), -1).mean(axis=1)
@@ -0,0 +1,292 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from src.backends import BACKENDS
+from src.inference_config import CONFIG_PATH
+from src.predictor import resolve_artifact
+from src.registry_manager import get_model_entry, load_registry
+
+BATCH_SIZES = (1, 2, 4, 8, 16, 32, 64)
+
+# Backends whose outputs differ from the float model. They only become a
+# default when asked for, or when the quantization report shows at most
+# MAX_ACCURACY_DROP lost accuracy on held-out images.
+LOSSY_BACKENDS = ("tflite_int8",)
+MAX_ACCURACY_DROP = 0.005
+
+
+# ===============================
+# HELPERS
+# ===============================
+
+def _usable_cpus():
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _powers_of_two(limit):
+    """
+    1, 2, 4, ... up to `limit`, plus `limit` itself.
+    """
+    values = {limit}
+    n = 1
+    while n < limit:
+        values.add(n)
+        n *= 2
+    return sorted(values)
+
+
+def passes_parity(exp_id, backend, registry):
+    """
+    Whether a lossy backend's recorded accuracy stays within
+    MAX_ACCURACY_DROP of the float model (see src/quantize.py).
+    """
+    if backend != "tflite_int8":
+        return False
+    entry = get_model_entry(exp_id, registry) or {}
+    delta = entry.get("quantization", {}).get("accuracy_delta")
+    return delta is not None and delta >= -MAX_ACCURACY_DROP
+
+
+def available_backends(exp_id, registry, allow_lossy=False):
+    found = []
+    for backend in BACKENDS:
+        if backend in LOSSY_BACKENDS and not (allow_lossy or passes_parity(exp_id, backend, registry)):
+            continue
+        try:
+            resolve_artifact(exp_id, backend, registry)
+            found.append(backend)
+        except (FileNotFoundError, ValueError):
+            pass
+    return found
+
+
+def held_out_batch(batch_size, limit=256):
+    """
+    Batch of real validation images, cycled if there are fewer than
+    `batch_size`.
+    """
+    from src.preprocessing import list_labelled_images, load_image, stack_images
+    from src.utils import VAL_DIR
+
+    paths, _ = list_labelled_images(VAL_DIR)
+    if not paths:
+        raise FileNotFoundError(f"No labelled images found in {VAL_DIR}")
+    images = [load_image(p) for p in paths[:min(limit, batch_size)]]
+    return stack_images(images[i % len(images)] for i in range(batch_size))
+
+
+# ===============================
+# PROBE (ONE THREAD CONFIG, FRESH PROCESS)
+# ===============================
+
+def probe(backend, intra_op_threads, inter_op_threads, batch_sizes, runs, warmup, held_out):
+    """
+    Latency/throughput of one backend and thread configuration over a
+    range of batch sizes. TensorFlow fixes its thread pools at start-up,
+    so every configuration is probed in its own interpreter.
+    """
+    from src.benchmark import summarize_latencies, synthetic_batch, time_calls
+    from src.predictor import Predictor
+    from src.worker_pool import _configure_threads
+
+    _configure_threads(intra_op_threads, inter_op_threads, None)
+    predictor = Predictor(
+        backend,
+        num_threads=intra_op_threads,
+        inter_op_threads=inter_op_threads,
+    )
+
+    results = []
+    for batch_size in batch_sizes:
+        x = held_out_batch(batch_size) if held_out else synthetic_batch(batch_size)
+        latencies = time_calls(predictor.predict_array, x, runs, warmup)
+        results.append({
+            "backend": backend,
+            "batch_size": batch_size,
+            "intra_op_threads": intra_op_threads,
+            "inter_op_threads": inter_op_threads,
+            "workers": 1,
+            "pin": False,
+            **summarize_latencies(latencies, batch_size),
+        })
+    return results
+
+
+def _run_probe(backend, intra, inter, batch_sizes, runs, warmup, held_out):
+    cmd = [
+        sys.executable, "-m", "src.tune", "--probe",
+        "--backends", backend,
+        "--intra", str(intra),
+        "--inter", str(inter),
+        "--batch-sizes", ",".join(map(str, batch_sizes)),
+        "--runs", str(runs),
+        "--warmup", str(warmup),
+    ]
+    if held_out:
+        cmd.append("--held-out")
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        err = proc.stderr.strip().splitlines()
+        return [{"backend": backend, "intra_op_threads": intra,
+                 "inter_op_threads": inter, "error": err[-1] if err else "failed"}]
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _measure_workers(backend, workers, batch_size, batches, held_out):
+    from src.benchmark import synthetic_batch
+    from src.worker_pool import InferencePool
+
+    x = held_out_batch(batch_size) if held_out else synthetic_batch(batch_size)
+    with InferencePool(workers, backend, pin=True) as pool:
+        for _ in pool.map([x] * workers):
+            pass
+        start = time.perf_counter()
+        for _ in pool.map([x] * batches):
+            pass
+        elapsed = time.perf_counter() - start
+
+    return {
+        "backend": backend,
+        "batch_size": batch_size,
+        "intra_op_threads": pool.intra_op_threads,
+        "inter_op_threads": pool.inter_op_threads,
+        "workers": workers,
+        "pin": True,
+        "images_per_sec": round(batches * batch_size / elapsed, 2),
+    }
+
+
+# ===============================
+# SWEEP
+# ===============================
+
+def _profile(trial):
+    keys = ("backend", "batch_size", "intra_op_threads", "inter_op_threads", "workers", "pin",
+            "latency_p95_ms", "images_per_sec")
+    return {k: trial.get(k) for k in keys}
+
+
+def tune(backends=None, batch_sizes=BATCH_SIZES, runs=20, warmup=3,
+         held_out=False, worker_batches=20, verbose=True, allow_lossy=False):
+    """
+    Sweep backend x thread counts x batch size (and worker count for the
+    best throughput setting), then pick:
+
+      latency    - lowest p95 at batch size 1 in a single process
+      throughput - highest images/sec over everything tried
+
+    Lossy backends are only swept with `allow_lossy` or when they pass
+    the accuracy parity check; naming them in `backends` opts in.
+    """
+    registry = load_registry()
+    exp_id = registry.get("production_model")
+    if not exp_id:
+        raise RuntimeError("No production model set in registry")
+
+    backends = backends or available_backends(exp_id, registry, allow_lossy)
+    cpus = _usable_cpus()
+
+    trials = []
+    for backend in backends:
+        for intra in _powers_of_two(cpus):
+            for inter in sorted({1, min(2, cpus)}):
+                results = _run_probe(backend, intra, inter, batch_sizes, runs, warmup, held_out)
+                trials.extend(results)
+                if verbose:
+                    for r in results:
+                        if "error" in r:
+                            print(f"{backend:12s} intra {intra:3d} inter {inter}  ERROR {r['error']}")
+                        else:
+                            print(
+                                f"{backend:12s} intra {intra:3d} inter {inter}  "
+                                f"batch {r['batch_size']:3d}  p95 {r['latency_p95_ms']:9.3f}ms  "
+                                f"{r['images_per_sec']:9.2f} img/s"
+                            )
+
+    ok = [t for t in trials if "error" not in t]
+    if not ok:
+        raise RuntimeError("Every tuning probe failed")
+
+    best_single = max(ok, key=lambda t: t["images_per_sec"])
+    for workers in _powers_of_two(cpus)[1:]:
+        try:
+            result = _measure_workers(
+                best_single["backend"], workers, best_single["batch_size"],
+                worker_batches, held_out,
+            )
+        except Exception as e:
+            trials.append({"backend": best_single["backend"], "workers": workers,
+                           "error": f"{type(e).__name__}: {e}"})
+            if verbose:
+                print(f"{best_single['backend']:12s} {workers:3d} workers  ERROR {e}")
+            continue
+        trials.append(result)
+        ok.append(result)
+        if verbose:
+            print(f"{result['backend']:12s} {workers:3d} workers  "
+                  f"batch {result['batch_size']:3d}  {result['images_per_sec']:9.2f} img/s")
+
+    latency_candidates = [t for t in ok if t["batch_size"] == 1 and t["workers"] == 1]
+    latency = min(latency_candidates or ok, key=lambda t: t.get("latency_p95_ms", float("inf")))
+    throughput = max(ok, key=lambda t: t["images_per_sec"])
+
+    config = {
+        "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "exp_id": exp_id,
+        "cpus": cpus,
+        "images": "held_out" if held_out else "synthetic",
+        "latency": _profile(latency),
+        "throughput": _profile(throughput),
+        "trials": trials,
+    }
+    CONFIG_PATH.parent.mkdir(parents=True, exist_ok=True)
+    CONFIG_PATH.write_text(json.dumps(config, indent=2))
+    return config
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", help="Comma-separated backends (default: all exported)")
+    parser.add_argument("--batch-sizes", default=",".join(map(str, BATCH_SIZES)))
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--held-out", action="store_true",
+                        help="Time on validation images instead of synthetic ones")
+    parser.add_argument("--allow-lossy", action="store_true",
+                        help="Let int8 be auto-selected without an accuracy parity check")
+    parser.add_argument("--probe", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--intra", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--inter", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",")]
+
+    if args.probe:
+        results = probe(args.backends, args.intra, args.inter, batch_sizes,
+                        args.runs, args.warmup, args.held_out)
+        print(json.dumps(results))
+        return
+
+    backends = args.backends.split(",") if args.backends else None
+    config = tune(backends, batch_sizes, args.runs, args.warmup, args.held_out,
+                  allow_lossy=args.allow_lossy)
+
+    print(f"\nWrote {CONFIG_PATH}")
+    for name in ("latency", "throughput"):
+        p = config[name]
+        print(
+            f"{name:10s} {p['backend']:12s} batch {p['batch_size']:3d}  "
+            f"intra {p['intra_op_threads']}  inter {p['inter_op_threads']}  "
+            f"workers {p['workers']}  {p['images_per_sec']} img/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+
+from src.bulk_inference import batch_stage
+from src.predictor import get_predictor
+from src.preprocessing import ParallelDecoder, load_image, stack_images
+from src.utils import CLASS_NAMES
+
+VIDEO_BATCH_SIZE = 8
+SMOOTHING_WINDOW = 15
+# Mean absolute difference (0-255 scale) of downsampled grey frames
+# below which a frame is treated as a repeat of the last inferred one.
+DIFF_THRESHOLD = 2.0
+DIFF_STRIDE = 8
+# Re-run the model at least this often even on a static scene.
+MAX_SKIP = 30
+
+_DONE = object()
+
+
+# ===============================
+# FRAME SOURCES
+# ===============================
+
+def open_frames(source):
+    """
+    Yield RGB uint8 frames from a video file, a camera index (int or a
+    digit string), or any iterable of arrays.
+    """
+    if not isinstance(source, (str, Path, int)):
+        yield from source
+        return
+
+    import cv2
+
+    if isinstance(source, str) and source.isdigit():
+        source = int(source)
+    cap = cv2.VideoCapture(source if isinstance(source, int) else str(source))
+    if not cap.isOpened():
+        raise FileNotFoundError(f"Could not open video source: {source}")
+    try:
+        while True:
+            ok, frame = cap.read()
+            if not ok:
+                return
+            yield cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    finally:
+        cap.release()
+
+
+def video_fps(source):
+    """
+    Frame rate a video file reports (CAP_PROP_FPS), or None for cameras,
+    frame iterables and files without one.
+    """
+    if not isinstance(source, (str, Path)) or str(source).isdigit():
+        return None
+
+    import cv2
+
+    cap = cv2.VideoCapture(str(source))
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) if cap.isOpened() else 0.0
+    finally:
+        cap.release()
+    return fps if fps > 0 else None
+
+
+def synthetic_frames(count=300, height=480, width=640, seed=0):
+    """
+    Conveyor-belt style test clip: bananas of each ripeness colour slide
+    across a grey belt, with stretches where the belt is stopped so
+    consecutive frames are near-identical.
+    """
+    rng = np.random.default_rng(seed)
+    colours = {
+        "unripe": (90, 160, 40),
+        "ripe": (230, 200, 40),
+        "overripe": (170, 120, 30),
+        "rotten": (50, 35, 20),
+    }
+    belt = np.full((height, width, 3), 120, dtype=np.uint8)
+    belt[:, ::40] = 100
+
+    x = 0
+    for i in range(count):
+        segment = i // 60
+        colour = colours[CLASS_NAMES[segment % len(CLASS_NAMES)]]
+        if (i % 60) < 40:
+            x = (x + 12) % width
+
+        frame = belt.copy()
+        y0 = height // 2 - 60
+        x0, x1 = x, min(width, x + 260)
+        frame[y0:y0 + 120, x0:x1] = colour
+        noise = rng.integers(0, 3, size=frame.shape, dtype=np.uint8)
+        yield frame + noise
+
+
+def write_synthetic_video(path, count=300, fps=30, **kwargs):
+    """
+    Encode synthetic_frames() to a video file (requires OpenCV).
+    """
+    import cv2
+
+    frames = synthetic_frames(count, **kwargs)
+    first = next(frames)
+    height, width = first.shape[:2]
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    try:
+        for frame in (first, *frames):
+            writer.write(cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
+    finally:
+        writer.release()
+    return Path(path)
+
+
+# ===============================
+# PIPELINE STAGES
+# ===============================
+
+class FrameReader:
+    """
+    Reads frames on a background thread into a bounded queue and marks
+    near-duplicates with a cheap downsampled frame difference.
+
+    With `drop_when_full` (live cameras) frames that arrive while the
+    queue is full are dropped instead of stalling the capture.
+    """
+
+    def __init__(self, frames, maxsize=64, diff_threshold=DIFF_THRESHOLD,
+                 max_skip=MAX_SKIP, drop_when_full=False):
+        self.frames = frames
+        self.diff_threshold = diff_threshold
+        self.max_skip = max_skip
+        self.drop_when_full = drop_when_full
+        self.read = 0
+        self.dropped = 0
+        self.skipped = 0
+        self._queue = queue.Queue(maxsize=maxsize)
+
+    def _thumb(self, frame):
+        return frame[::DIFF_STRIDE, ::DIFF_STRIDE].mean(axis=2, dtype=np.float32)
+
+    def _run(self):
+        last = None
+        since_inferred = 0
+        try:
+            for index, frame in enumerate(self.frames):
+                self.read += 1
+                thumb = self._thumb(frame)
+                repeat = (
+                    last is not None
+                    and since_inferred < self.max_skip
+                    and float(np.abs(thumb - last).mean()) < self.diff_threshold
+                )
+
+                item = (index, frame, repeat)
+                if self.drop_when_full:
+                    try:
+                        self._queue.put_nowait(item)
+                    except queue.Full:
+                        self.dropped += 1
+                        continue
+                else:
+                    self._queue.put(item)
+
+                if repeat:
+                    since_inferred += 1
+                    self.skipped += 1
+                else:
+                    last, since_inferred = thumb, 0
+        except BaseException as e:
+            self._queue.put(e)
+        self._queue.put(_DONE)
+
+    def __iter__(self):
+        threading.Thread(target=self._run, daemon=True).start()
+        while True:
+            item = self._queue.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+
+def _resize_kept(item):
+    _, frame, repeat = item
+    return None if repeat else load_image(frame)
+
+
+class TemporalSmoother:
+    """
+    Mean of the last `window` probability vectors, kept as a running sum.
+    """
+
+    def __init__(self, window=SMOOTHING_WINDOW):
+        self.window = window
+        self._rows = deque()
+        self._sum = np.zeros(len(CLASS_NAMES), dtype=np.float64)
+
+    def update(self, probs):
+        self._rows.append(probs)
+        self._sum += probs
+        if len(self._rows) > self.window:
+            self._sum -= self._rows.popleft()
+        return self._sum / len(self._rows)
+
+
+# ===============================
+# ENTRY POINT
+# ===============================
+
+def run_video_inference(
+    source,
+    backend="keras",
+    batch_size=VIDEO_BATCH_SIZE,
+    window=SMOOTHING_WINDOW,
+    diff_threshold=DIFF_THRESHOLD,
+    decode_workers=None,
+    live=False,
+    fps=None,
+    stats=None,
+    predictor=None,
+):
+    """
+    Yield one record per frame: raw and smoothed label/confidence and
+    whether the model actually ran on it. Frame times use `fps`, or the
+    rate the video file reports when it is not given.
+
+    Frames flow reader thread -> decode pool -> batched model stage.
+    Near-identical frames reuse the last prediction instead of being
+    resized and inferred. If `stats` is a dict it is filled in with
+    pipeline counters once the source is exhausted.
+    """
+    if predictor is None:
+        predictor = get_predictor(backend)
+        predictor.backend  # load the model before the first frame arrives
+    fps = fps or video_fps(source)
+    reader = FrameReader(open_frames(source), maxsize=batch_size * 8,
+                         diff_threshold=diff_threshold, drop_when_full=live)
+    decoder = ParallelDecoder(workers=decode_workers, max_in_flight=batch_size * 2,
+                              decode_fn=_resize_kept)
+    smoother = TemporalSmoother(window)
+
+    last = np.full(len(CLASS_NAMES), 1.0 / len(CLASS_NAMES), dtype=np.float32)
+    inferred = 0
+    model_seconds = 0.0
+    start = time.perf_counter()
+
+    for batch in batch_stage(decoder.imap(reader), batch_size):
+        kept = [img for _, img, err in batch if img is not None]
+        if kept:
+            t0 = time.perf_counter()
+            probs = iter(predictor.predict_array(stack_images(kept)))
+            model_seconds += time.perf_counter() - t0
+            inferred += len(kept)
+
+        for (index, _, repeat), img, err in batch:
+            if err is not None:
+                raise ValueError(f"Could not process frame {index}: {err}")
+            if img is not None:
+                last = next(probs)
+            smooth = smoother.update(last)
+            raw_idx, smooth_idx = int(last.argmax()), int(smooth.argmax())
+            yield {
+                "frame": index,
+                "time": round(index / fps, 3) if fps else None,
+                "inferred": img is not None,
+                "label": CLASS_NAMES[raw_idx],
+                "confidence": round(float(last[raw_idx]), 4),
+                "smoothed_label": CLASS_NAMES[smooth_idx],
+                "smoothed_confidence": round(float(smooth[smooth_idx]), 4),
+            }
+
+    if stats is not None:
+        elapsed = time.perf_counter() - start
+        stats.update({
+            "exp_id": predictor.exp_id,
+            "backend": backend,
+            "frames_read": reader.read,
+            "frames_dropped": reader.dropped,
+            "frames_skipped": reader.skipped,
+            "frames_inferred": inferred,
+            "seconds": round(elapsed, 2),
+            "frames_per_sec": round(reader.read / elapsed, 2) if elapsed else None,
+            "model_frames_per_sec": round(inferred / model_seconds, 2) if model_seconds else None,
+        })
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("source", nargs="?",
+                        help="Video file or camera index (omit with --synthetic)")
+    parser.add_argument("--synthetic", type=int, metavar="FRAMES",
+                        help="Run on a generated conveyor clip of this many frames")
+    parser.add_argument("--write-synthetic", metavar="PATH",
+                        help="Only write the synthetic clip to a video file")
+    parser.add_argument("--out", help="Per-frame JSONL output")
+    parser.add_argument("--backend", default="keras")
+    parser.add_argument("--batch-size", type=int, default=VIDEO_BATCH_SIZE)
+    parser.add_argument("--window", type=int, default=SMOOTHING_WINDOW)
+    parser.add_argument("--diff-threshold", type=float, default=DIFF_THRESHOLD)
+    parser.add_argument("--fps", type=float,
+                        help="Frame rate for timestamps (default: the file's own; 30 for synthetic clips)")
+    args = parser.parse_args()
+
+    if args.write_synthetic:
+        print(write_synthetic_video(args.write_synthetic, args.synthetic or 300, int(args.fps or 30)))
+        return
+
+    fps = args.fps
+    if args.synthetic:
+        source = synthetic_frames(args.synthetic)
+        fps = fps or 30.0
+    elif args.source is not None:
+        source = args.source
+    else:
+        parser.error("give a video source or --synthetic FRAMES")
+    live = isinstance(source, str) and source.isdigit()
+
+    stats = {}
+    out = open(args.out, "w", encoding="utf-8") if args.out else None
+    try:
+        for record in run_video_inference(
+            source, args.backend, args.batch_size, args.window,
+            args.diff_threshold, live=live, fps=fps, stats=stats,
+        ):
+            if out is not None:
+                out.write(json.dumps(record) + "\n")
+    finally:
+        if out is not None:
+            out.close()
+
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
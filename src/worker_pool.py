@@ -0,0 +1,305 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from collections import deque
+from itertools import count
+
+import numpy as np
+
+from src.predictor import OUTPUTS_DIR
+
+_STOP = None
+# How often a caller waiting on results re-checks that workers are alive
+POLL_SECONDS = 1.0
+
+
+# ===============================
+# WORKER PROCESS
+# ===============================
+
+def _configure_threads(intra_op_threads, inter_op_threads, cpus):
+    """
+    Pin the process and cap TensorFlow's thread pools. Must run before
+    TensorFlow is imported in the worker.
+    """
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+    if intra_op_threads:
+        os.environ["TF_NUM_INTRAOP_THREADS"] = str(intra_op_threads)
+        os.environ["OMP_NUM_THREADS"] = str(intra_op_threads)
+    if inter_op_threads:
+        os.environ["TF_NUM_INTEROP_THREADS"] = str(inter_op_threads)
+
+    import tensorflow as tf
+
+    if intra_op_threads:
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+    if inter_op_threads:
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+
+
+def _worker_main(backend, intra_op_threads, inter_op_threads, cpus, tasks, results):
+    try:
+        _configure_threads(intra_op_threads, inter_op_threads, cpus)
+
+        from src.predictor import Predictor
+
+        predictor = Predictor(
+            backend,
+            num_threads=intra_op_threads,
+            inter_op_threads=inter_op_threads,
+        )
+        results.put(("ready", os.getpid(), (predictor.exp_id, str(predictor.model_path))))
+    except Exception as e:
+        results.put(("failed", os.getpid(), f"{type(e).__name__}: {e}"))
+        return
+
+    while True:
+        task = tasks.get()
+        if task is _STOP:
+            return
+        batch_id, x = task
+        try:
+            results.put(("ok", batch_id, predictor.predict_array(x)))
+        except Exception as e:
+            results.put(("error", batch_id, f"{type(e).__name__}: {e}"))
+
+
+def _split_cpus(workers):
+    """
+    Give each worker a contiguous, disjoint slice of the usable CPUs.
+    """
+    if not hasattr(os, "sched_getaffinity"):
+        return [None] * workers
+    cpus = sorted(os.sched_getaffinity(0))
+    per_worker = max(1, len(cpus) // workers)
+    slices = []
+    for i in range(workers):
+        start = (i * per_worker) % len(cpus)
+        slices.append(set(cpus[start:start + per_worker]))
+    return slices
+
+
+# ===============================
+# POOL / DISPATCHER
+# ===============================
+
+class InferencePool:
+    """
+    N spawned processes, each holding its own copy of the production
+    model. Batches are dispatched through a shared task queue, so an idle
+    worker always takes the next one, and results come back in order.
+
+    By default each worker gets cpu_count // workers intra-op threads and
+    one inter-op thread; `pin=True` also binds each worker to its own
+    slice of cores (Linux only).
+
+    Batch ids come from one counter per pool, so several map() calls
+    (e.g. from different threads) can share the result queue: whichever
+    caller drains a result parks it for its owner.
+    """
+
+    def __init__(
+        self,
+        workers=2,
+        backend="keras",
+        intra_op_threads=None,
+        inter_op_threads=1,
+        pin=False,
+        start_timeout=300,
+        result_timeout=300,
+    ):
+        self.workers = workers
+        self.backend_name = backend
+        cpu_count = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+        self.intra_op_threads = intra_op_threads or max(1, (cpu_count or 1) // workers)
+        self.inter_op_threads = inter_op_threads
+        self.result_timeout = result_timeout
+        self.exp_id = None
+        self.model_path = None
+
+        self._ids = count()
+        self._done = {}
+        self._abandoned = set()
+        self._lock = threading.Lock()
+
+        ctx = mp.get_context("spawn")
+        self._tasks = ctx.Queue()
+        self._results = ctx.Queue()
+        cpu_sets = _split_cpus(workers) if pin else [None] * workers
+
+        self._procs = [
+            ctx.Process(
+                target=_worker_main,
+                args=(backend, self.intra_op_threads, inter_op_threads,
+                      cpus, self._tasks, self._results),
+                daemon=True,
+            )
+            for cpus in cpu_sets
+        ]
+        for p in self._procs:
+            p.start()
+
+        try:
+            for _ in self._procs:
+                status, _, detail = self._receive(start_timeout)
+                if status != "ready":
+                    raise RuntimeError(f"Inference worker failed to start: {detail}")
+                self.exp_id, self.model_path = detail
+        except BaseException:
+            self.close()
+            raise
+
+    def _receive(self, timeout):
+        """
+        Next message from any worker. Raises if a worker died or nothing
+        arrived within `timeout` seconds.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                return self._results.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                pass
+            for p in self._procs:
+                if not p.is_alive():
+                    raise RuntimeError(f"Inference worker {p.pid} exited with code {p.exitcode}")
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"No inference result within {timeout}s")
+
+    def _wait_for(self, batch_id):
+        with self._lock:
+            while batch_id not in self._done:
+                status, done_id, payload = self._receive(self.result_timeout)
+                if done_id in self._abandoned:
+                    self._abandoned.discard(done_id)
+                else:
+                    self._done[done_id] = (status, payload)
+            status, payload = self._done.pop(batch_id)
+        if status != "ok":
+            raise RuntimeError(f"Batch {batch_id} failed: {payload}")
+        return payload
+
+    def map(self, batches, max_in_flight=None):
+        """
+        Yield probabilities for each uint8 batch, in input order, keeping at
+        most `max_in_flight` batches queued (default 2 per worker).
+        """
+        max_in_flight = max_in_flight or self.workers * 2
+        pending = deque()
+
+        try:
+            for x in batches:
+                batch_id = next(self._ids)
+                self._tasks.put((batch_id, np.ascontiguousarray(x)))
+                pending.append(batch_id)
+
+                while len(pending) >= max_in_flight:
+                    yield self._wait_for(pending.popleft())
+
+            while pending:
+                yield self._wait_for(pending.popleft())
+        finally:
+            # Results of batches this call no longer wants are dropped on arrival
+            with self._lock:
+                for batch_id in pending:
+                    if self._done.pop(batch_id, None) is None:
+                        self._abandoned.add(batch_id)
+
+    def predict_array(self, x):
+        return next(self.map([x]))
+
+    def close(self):
+        for _ in self._procs:
+            self._tasks.put(_STOP)
+        for p in self._procs:
+            p.join(timeout=10)
+            if p.is_alive():
+                p.terminate()
+        # Tasks no worker will read must not block interpreter exit
+        self._tasks.cancel_join_thread()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ===============================
+# SCALING REPORT
+# ===============================
+
+def measure_scaling(max_workers=None, batch_size=16, batches=40, backend="keras", pin=False):
+    """
+    Throughput of the pool at 1, 2, 4, ... max_workers processes on the
+    same synthetic workload.
+    """
+    from src.benchmark import synthetic_batch
+
+    max_workers = max_workers or os.cpu_count() or 1
+    counts = sorted({1, max_workers} | {2 ** i for i in range(max_workers.bit_length()) if 2 ** i <= max_workers})
+    x = synthetic_batch(batch_size)
+
+    results = []
+    for workers in counts:
+        with InferencePool(workers, backend, pin=pin) as pool:
+            for _ in pool.map([x] * workers):
+                pass  # warm every worker
+
+            start = time.perf_counter()
+            for _ in pool.map([x] * batches):
+                pass
+            elapsed = time.perf_counter() - start
+
+        results.append({
+            "exp_id": pool.exp_id,
+            "backend": backend,
+            "workers": workers,
+            "intra_op_threads": pool.intra_op_threads,
+            "batch_size": batch_size,
+            "images_per_sec": round(batches * batch_size / elapsed, 2),
+        })
+
+    base = results[0]["images_per_sec"]
+    for r in results:
+        r["speedup"] = round(r["images_per_sec"] / base, 2)
+        r["efficiency"] = round(r["speedup"] / r["workers"], 2)
+    return results
+
+
+def save_scaling_report(results):
+    exp_id = results[0]["exp_id"]
+    path = OUTPUTS_DIR / exp_id / "worker_scaling.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, indent=2))
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--max-workers", type=int, default=None,
+                        help="Largest pool size to try (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--batches", type=int, default=40)
+    parser.add_argument("--backend", default="keras")
+    parser.add_argument("--pin", action="store_true", help="Pin workers to disjoint cores")
+    args = parser.parse_args()
+
+    results = measure_scaling(args.max_workers, args.batch_size, args.batches,
+                              args.backend, args.pin)
+    save_scaling_report(results)
+    for r in results:
+        print(
+            f"{r['workers']:3d} workers x {r['intra_op_threads']:2d} threads  "
+            f"{r['images_per_sec']:9.2f} img/s  speedup {r['speedup']:5.2f}  "
+            f"efficiency {r['efficiency']:4.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
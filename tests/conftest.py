@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from src.utils import CLASS_NAMES, IMG_SIZE
+
+
+class ModelPredictor:
+    """
+    predict_array over a Keras model, recording the size of every batch.
+    """
+
+    exp_id = "tiny"
+
+    def __init__(self, model):
+        self.model = model
+        self.batch_sizes = []
+
+    def predict_array(self, x):
+        self.batch_sizes.append(len(x))
+        return self.model(x.astype(np.float32), training=False).numpy()
+
+
+@pytest.fixture(scope="session")
+def tiny_model():
+    """
+    Untrained build_model() (no ImageNet download), built once per session.
+    """
+    from src.model_builder import build_model
+
+    model = build_model(len(CLASS_NAMES), weights=None)
+    model(np.zeros((1, IMG_SIZE[1], IMG_SIZE[0], 3), dtype=np.float32))  # build/trace once
+    return model
+
+
+@pytest.fixture
+def tiny_predictor(tiny_model):
+    return ModelPredictor(tiny_model)
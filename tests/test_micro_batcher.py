@@ -0,0 +1,68 @@
+import time
+
+import numpy as np
+import pytest
+
+from src.inference_server import MicroBatcher
+from src.utils import CLASS_NAMES, IMG_SIZE
+
+RESULT_TIMEOUT = 30
+
+
+@pytest.fixture
+def images():
+    rng = np.random.default_rng(0)
+    return [
+        rng.integers(0, 256, size=(IMG_SIZE[1], IMG_SIZE[0], 3), dtype=np.uint8)
+        for _ in range(4)
+    ]
+
+
+def test_batch_closes_on_size(tiny_model, tiny_predictor, images):
+    # A deadline far beyond the test timeout: only the size can close it
+    batcher = MicroBatcher(tiny_predictor, max_batch_size=4, max_wait_ms=600_000)
+    try:
+        futures = [batcher.submit(img) for img in images]
+        rows = [f.result(timeout=RESULT_TIMEOUT) for f in futures]
+    finally:
+        batcher.close()
+
+    assert tiny_predictor.batch_sizes == [4]
+    expected = tiny_model(np.stack(images).astype(np.float32), training=False).numpy()
+    np.testing.assert_allclose(np.stack(rows), expected, rtol=1e-5, atol=1e-6)
+
+
+def test_batch_closes_on_deadline(tiny_predictor, images):
+    batcher = MicroBatcher(tiny_predictor, max_batch_size=16, max_wait_ms=50)
+    try:
+        start = time.monotonic()
+        futures = [batcher.submit(img) for img in images[:2]]
+        rows = [f.result(timeout=RESULT_TIMEOUT) for f in futures]
+        elapsed = time.monotonic() - start
+    finally:
+        batcher.close()
+
+    assert tiny_predictor.batch_sizes == [2]
+    assert elapsed >= 0.05
+    assert all(row.shape == (len(CLASS_NAMES),) for row in rows)
+    stats = batcher.stats()
+    assert stats["batches"] == 1 and stats["images"] == 2
+
+
+def test_failed_batch_falls_back_to_single_items(tiny_model, tiny_predictor, images):
+    bad = np.zeros((8, 8, 3), dtype=np.uint8)  # cannot be stacked into a batch
+    batcher = MicroBatcher(tiny_predictor, max_batch_size=3, max_wait_ms=600_000)
+    try:
+        futures = [batcher.submit(images[0]), batcher.submit(bad), batcher.submit(images[1])]
+        good = [futures[0].result(timeout=RESULT_TIMEOUT), futures[2].result(timeout=RESULT_TIMEOUT)]
+        with pytest.raises(ValueError):
+            futures[1].result(timeout=RESULT_TIMEOUT)
+    finally:
+        batcher.close()
+
+    # The whole batch failed while stacking, then each good image ran alone
+    assert tiny_predictor.batch_sizes == [1, 1]
+    stats = batcher.stats()
+    assert stats["batches"] == 2 and stats["images"] == 2
+    expected = tiny_model(np.stack(images[:2]).astype(np.float32), training=False).numpy()
+    np.testing.assert_allclose(np.stack(good), expected, rtol=1e-5, atol=1e-6)
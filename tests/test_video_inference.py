@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("cv2")
+
+from src.utils import CLASS_NAMES  # noqa: E402
+from src.video_inference import run_video_inference, video_fps, write_synthetic_video  # noqa: E402
+
+FPS = 12
+FRAMES = 60  # 40 moving frames, then the belt stops
+
+
+@pytest.fixture(scope="module")
+def clip(tmp_path_factory):
+    return write_synthetic_video(
+        tmp_path_factory.mktemp("video") / "belt.mp4", FRAMES, FPS, height=120, width=160
+    )
+
+
+def test_video_fps_reads_the_file_rate(clip):
+    assert video_fps(clip) == pytest.approx(FPS)
+    assert video_fps("0") is None
+    assert video_fps([np.zeros((4, 4, 3), dtype=np.uint8)]) is None
+
+
+def test_per_frame_records(clip, tiny_predictor):
+    stats = {}
+    records = list(run_video_inference(clip, batch_size=4, stats=stats, predictor=tiny_predictor))
+
+    assert [r["frame"] for r in records] == list(range(FRAMES))
+    # Timestamps follow the clip's own frame rate, not a 30 fps default
+    assert records[-1]["time"] == round((FRAMES - 1) / FPS, 3)
+    assert all(r["label"] in CLASS_NAMES and r["smoothed_label"] in CLASS_NAMES for r in records)
+    assert all(0.0 <= r["confidence"] <= 1.0 for r in records)
+
+    # The stopped belt is skipped, and skipped frames repeat the last prediction
+    assert records[0]["inferred"]
+    assert stats["frames_read"] == FRAMES
+    assert 0 < stats["frames_inferred"] < FRAMES
+    assert stats["frames_skipped"] == FRAMES - stats["frames_inferred"]
+    for prev, rec in zip(records, records[1:]):
+        if not rec["inferred"]:
+            assert (rec["label"], rec["confidence"]) == (prev["label"], prev["confidence"])
+
+
+def test_explicit_fps_overrides_the_file(clip, tiny_predictor):
+    records = list(run_video_inference(clip, fps=30, predictor=tiny_predictor))
+    assert records[30]["time"] == 1.0